@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图像预处理微基准
+生成一张超大 JPEG 截图，分别以原缩放路径（fast_downscale 关闭）与快速缩放路径
+（JPEG draft + Image.reduce）预处理，报告每张图与每百万像素的进程 CPU 时间；
+另测 passthrough 直接上传小图的耗时
+
+用法: python benchmarks/bench_preprocess.py [--width 4000 --height 9000 --max-size 1600 --runs 5]
+"""
+
+import os
+import sys
+import copy
+import time
+import argparse
+import tempfile
+
+from PIL import Image, ImageDraw
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lightweight_image_utils import ImagePreprocessor  # noqa: E402
+from lightweight_ocr_processor import LightweightOCRProcessor  # noqa: E402
+
+
+def load_config(overrides: dict) -> dict:
+    """读取仓库默认配置并覆盖 image_preprocessing 中的参数（关闭分块与裁剪，只测缩放）"""
+    config = copy.deepcopy(LightweightOCRProcessor._load_config(None, os.path.join(ROOT, "config", "api_config.json")))
+    config["image_preprocessing"].update(overrides)
+    config.setdefault("tiling", {})["enabled"] = False
+    config.setdefault("text_crop", {})["enabled"] = False
+    config.setdefault("near_duplicate", {})["enabled"] = False
+    return config
+
+
+def make_screenshot(path: str, width: int, height: int):
+    """生成带文字行的白底截图"""
+    img = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(img)
+    for y in range(0, height, 60):
+        draw.text((50, y), '6222 0000 1234 5678 balance 437.07 ' * 3, fill='black')
+    img.save(path, quality=90)
+
+
+def cpu_time_per_image(preprocessor: ImagePreprocessor, path: str, runs: int):
+    start = time.process_time()
+    for _ in range(runs):
+        payload = preprocessor.preprocess(path)
+    return (time.process_time() - start) / runs, payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=9000)
+    parser.add_argument('--max-size', type=int, default=1600)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    megapixels = args.width * args.height / 1e6
+    with tempfile.TemporaryDirectory() as workdir:
+        big_path = os.path.join(workdir, 'big.jpg')
+        make_screenshot(big_path, args.width, args.height)
+        print(f"{args.width}x{args.height} q90 JPEG, max_size {args.max_size}, {args.runs} 次平均（进程CPU时间）")
+
+        for label, fast in (('baseline ', False), ('fast path', True)):
+            preprocessor = ImagePreprocessor(load_config({'max_size': args.max_size, 'fast_downscale': fast}))
+            seconds, payload = cpu_time_per_image(preprocessor, big_path, args.runs)
+            print(f"  {label} {seconds * 1000:6.0f} ms/image  {seconds * 1000 / megapixels:5.1f} ms CPU per megapixel"
+                  f"  -> {payload.size} {len(payload)} bytes")
+
+        small_path = os.path.join(workdir, 'small.jpg')
+        Image.new('RGB', (1080, 2400), 'white').save(small_path, quality=90)
+        preprocessor = ImagePreprocessor(load_config({'passthrough': True}))
+        seconds, payload = cpu_time_per_image(preprocessor, small_path, args.runs)
+        print(f"  passthrough 1080x2400 JPEG {seconds * 1000:.1f} ms  -> {payload.format} {len(payload)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,10 +8,12 @@
 import os
 import json
 import uuid
+import threading
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, flash, Response, stream_with_context
 from werkzeug.utils import secure_filename
 from lightweight_ocr_processor import LightweightOCRProcessor
+from lightweight_result_store import ResultStore
 import logging
 
 # 配置日志
@@ -32,8 +34,19 @@ os.makedirs(RESULTS_FOLDER, exist_ok=True)
 os.makedirs('config', exist_ok=True)
 os.makedirs('templates/admin', exist_ok=True)
 
-# 初始化OCR处理器
-ocr_processor = LightweightOCRProcessor()
+# OCR处理器在首次使用时创建：预处理子进程以 spawn 方式启动时会重新导入本模块，
+# 在模块级创建会让每个子进程都加载银行库、启动监控线程
+_ocr_processor = None
+_ocr_processor_lock = threading.Lock()
+
+def get_ocr_processor() -> LightweightOCRProcessor:
+    """获取OCR处理器（首次调用时创建）"""
+    global _ocr_processor
+    if _ocr_processor is None:
+        with _ocr_processor_lock:
+            if _ocr_processor is None:
+                _ocr_processor = LightweightOCRProcessor()
+    return _ocr_processor
 
 def allowed_file(filename):
     """检查文件扩展名是否允许"""
@@ -64,9 +77,9 @@ def upload_files():
             for file in files:
                 if file and allowed_file(file.filename):
                     filename = secure_filename(file.filename)
-                    # 添加时间戳避免文件名冲突
+                    # 添加时间戳和随机串避免并发上传时文件名冲突
                     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    filename = f"{timestamp}_{filename}"
+                    filename = f"{timestamp}_{uuid.uuid4().hex[:8]}_{filename}"
                     filepath = os.path.join(UPLOAD_FOLDER, filename)
                     file.save(filepath)
                     uploaded_files.append(filepath)
@@ -78,20 +91,26 @@ def upload_files():
                 return redirect(request.url)
             
             # 处理图片
-            results = ocr_processor.process_multiple_images(uploaded_files)
+            # 结果只属于本次请求，不写入共享处理器的 self.results
+            results = get_ocr_processor().process_multiple_images(uploaded_files, keep_results=False)
             
             # 生成结果文件
             session_id = str(uuid.uuid4())
             excel_path = os.path.join(RESULTS_FOLDER, f'results_{session_id}.xlsx')
             html_path = os.path.join(RESULTS_FOLDER, f'results_{session_id}.html')
             
-            ocr_processor.export_to_excel(excel_path)
-            ocr_processor.export_to_html(html_path)
-            
-            return render_template('results.html', 
-                                 results=results,
-                                 excel_file=f'results_{session_id}.xlsx',
-                                 html_file=f'results_{session_id}.html')
+            try:
+                get_ocr_processor().export_to_excel(excel_path, results)
+                get_ocr_processor().export_to_html(html_path, results)
+                
+                return render_template('results.html', 
+                                     results=results,
+                                     excel_file=f'results_{session_id}.xlsx',
+                                     html_file=f'results_{session_id}.html')
+            finally:
+                # 落盘的批量结果已导出并渲染，删除临时存储文件
+                if isinstance(results, ResultStore):
+                    results.delete()
             
         except Exception as e:
             logger.error(f"处理上传文件时出错: {e}")
@@ -103,13 +122,24 @@ def upload_files():
 @app.route('/admin')
 def admin_dashboard():
     """管理员仪表板"""
-    api_status = ocr_processor.get_api_status()
-    return render_template('admin/dashboard.html', api_status=api_status)
+    api_status = get_ocr_processor().get_api_status()
+    bank_status = get_ocr_processor().get_bank_database_status()
+    return render_template('admin/dashboard.html', api_status=api_status, bank_status=bank_status)
+
+@app.route('/admin/bank-database/reload', methods=['POST'])
+def reload_bank_database():
+    """重新加载银行库（构建完成后原子切换，处理中的请求不受影响）"""
+    if get_ocr_processor().reload_bank_database():
+        status = get_ocr_processor().get_bank_database_status()
+        flash(f"银行库已切换到第 {status['generation']} 代，共 {status['records']} 条记录", 'success')
+    else:
+        flash('银行库重新加载失败', 'error')
+    return redirect(url_for('admin_dashboard'))
 
 @app.route('/admin/api-config')
 def api_config():
     """API配置页面"""
-    current_config = ocr_processor.config['ocr_apis']
+    current_config = get_ocr_processor().config['ocr_apis']
     return render_template('admin/api_config.html', config=current_config)
 
 @app.route('/admin/api-config/update', methods=['POST'])
@@ -159,7 +189,7 @@ def update_api_config():
             })
         
         # 更新配置
-        success = ocr_processor.update_api_config(provider, config_data)
+        success = get_ocr_processor().update_api_config(provider, config_data)
         
         if success:
             flash(f'{provider.upper()} API配置已更新', 'success')
@@ -179,7 +209,7 @@ def test_api(provider):
     try:
         # 这里可以添加API测试逻辑
         # 暂时返回配置状态
-        api_status = ocr_processor.get_api_status()
+        api_status = get_ocr_processor().get_api_status()
         if provider in api_status:
             status = api_status[provider]
             if status['enabled'] and status['configured']:
@@ -220,12 +250,42 @@ def download_file(filename):
 def api_status():
     """获取API状态"""
     try:
-        status = ocr_processor.get_api_status()
+        status = get_ocr_processor().get_api_status()
         return jsonify({'success': True, 'status': status})
     except Exception as e:
         logger.error(f"获取API状态时出错: {e}")
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/connection-stats')
+def connection_stats():
+    """获取OCR服务商HTTP连接复用统计"""
+    try:
+        stats = get_ocr_processor().get_connection_stats()
+        return jsonify({'success': True, 'stats': stats})
+    except Exception as e:
+        logger.error(f"获取连接统计时出错: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/api/cache-stats')
+def cache_stats():
+    """获取OCR结果缓存统计"""
+    try:
+        stats = get_ocr_processor().get_cache_stats()
+        return jsonify({'success': True, 'stats': stats})
+    except Exception as e:
+        logger.error(f"获取缓存统计时出错: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/api/bank-database')
+def bank_database_status():
+    """API接口：获取当前银行库代信息"""
+    try:
+        status = get_ocr_processor().get_bank_database_status()
+        return jsonify({'success': True, 'bank_database': status})
+    except Exception as e:
+        logger.error(f"获取银行库状态时出错: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
 @app.route('/api/process', methods=['POST'])
 def api_process():
     """API接口：处理图片"""
@@ -243,7 +303,7 @@ def api_process():
             if file and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"{timestamp}_{filename}"
+                filename = f"{timestamp}_{uuid.uuid4().hex[:8]}_{filename}"
                 filepath = os.path.join(UPLOAD_FOLDER, filename)
                 file.save(filepath)
                 uploaded_files.append(filepath)
@@ -252,18 +312,62 @@ def api_process():
             return jsonify({'success': False, 'message': '没有有效的图片文件'})
         
         # 处理图片
-        results = ocr_processor.process_multiple_images(uploaded_files)
+        results = get_ocr_processor().process_multiple_images(uploaded_files, keep_results=False)
+        message = f'成功处理 {len(results)} 个文件'
+        
+        if not isinstance(results, ResultStore):
+            return jsonify({'success': True, 'message': message, 'results': results})
         
-        return jsonify({
-            'success': True,
-            'message': f'成功处理 {len(results)} 个文件',
-            'results': results
-        })
+        def generate():
+            # 超大批量的结果落盘保存，逐条读回并输出，输出完毕后删除存储文件
+            try:
+                yield '{"success": true, "message": ' + json.dumps(message, ensure_ascii=False) + ', "results": ['
+                for position, result in enumerate(results):
+                    yield (',' if position else '') + json.dumps(result, ensure_ascii=False, default=str)
+                yield ']}'
+            finally:
+                results.delete()
+        
+        return Response(stream_with_context(generate()), mimetype='application/json')
         
     except Exception as e:
         logger.error(f"API处理请求时出错: {e}")
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/process/stream', methods=['POST'])
+def api_process_stream():
+    """API接口：流式处理图片，每完成一张即返回一行JSON（NDJSON）"""
+    try:
+        if 'files' not in request.files:
+            return jsonify({'success': False, 'message': '没有上传文件'})
+        
+        files = request.files.getlist('files')
+        uploaded_files = []
+        for file in files:
+            if file and allowed_file(file.filename):
+                filename = secure_filename(file.filename)
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                filename = f"{timestamp}_{uuid.uuid4().hex[:8]}_{filename}"
+                filepath = os.path.join(UPLOAD_FOLDER, filename)
+                file.save(filepath)
+                uploaded_files.append(filepath)
+        
+        if not uploaded_files:
+            return jsonify({'success': False, 'message': '没有有效的图片文件'})
+        
+        ordered = request.args.get('ordered', 'false').lower() == 'true'
+        
+        def generate():
+            # 客户端断开时生成器被关闭，剩余图像随之取消
+            for result in get_ocr_processor().iter_process_images(uploaded_files, ordered=ordered):
+                yield json.dumps(result, ensure_ascii=False, default=str) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except Exception as e:
+        logger.error(f"API流式处理请求时出错: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -276,8 +380,11 @@ if __name__ == '__main__':
     # 创建基本模板文件（如果不存在）
     create_basic_templates()
     
+    # 启动前加载OCR处理器（银行库等），首个请求无需等待
+    get_ocr_processor()
+    
     # 启动应用
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
 
 def create_basic_templates():
     """创建基本模板文件"""
@@ -8,6 +8,7 @@
 import os
 import json
 import uuid
+import threading
 from datetime import datetime
 from flask import Flask, render_template, request, jsonify, send_file, redirect, url_for, flash
 from werkzeug.utils import secure_filename
@@ -236,8 +237,19 @@ def create_basic_templates():
     
     print("基本模板文件已创建")
 
-# 初始化OCR处理器
-ocr_processor = LightweightOCRProcessor()
+# OCR处理器在首次使用时创建：预处理子进程以 spawn 方式启动时会重新导入本模块，
+# 在模块级创建会让每个子进程都加载银行库、启动监控线程
+_ocr_processor = None
+_ocr_processor_lock = threading.Lock()
+
+def get_ocr_processor() -> LightweightOCRProcessor:
+    """获取OCR处理器（首次调用时创建）"""
+    global _ocr_processor
+    if _ocr_processor is None:
+        with _ocr_processor_lock:
+            if _ocr_processor is None:
+                _ocr_processor = LightweightOCRProcessor()
+    return _ocr_processor
 
 def allowed_file(filename):
     """检查文件扩展名是否允许"""
@@ -278,14 +290,14 @@ def upload_files():
                 flash('没有有效的图片文件', 'error')
                 return redirect(request.url)
             
-            results = ocr_processor.process_multiple_images(uploaded_files)
+            results = get_ocr_processor().process_multiple_images(uploaded_files)
             
             session_id = str(uuid.uuid4())
             excel_path = os.path.join(RESULTS_FOLDER, f'results_{session_id}.xlsx')
             html_path = os.path.join(RESULTS_FOLDER, f'results_{session_id}.html')
             
-            ocr_processor.export_to_excel(excel_path)
-            ocr_processor.export_to_html(html_path)
+            get_ocr_processor().export_to_excel(excel_path)
+            get_ocr_processor().export_to_html(html_path)
             
             return render_template('results.html', 
                                  results=results,
@@ -302,13 +314,13 @@ def upload_files():
 @app.route('/admin')
 def admin_dashboard():
     """管理员仪表板"""
-    api_status = ocr_processor.get_api_status()
+    api_status = get_ocr_processor().get_api_status()
     return render_template('admin/dashboard.html', api_status=api_status)
 
 @app.route('/admin/api-config')
 def api_config():
     """API配置页面"""
-    current_config = ocr_processor.config['ocr_apis']
+    current_config = get_ocr_processor().config['ocr_apis']
     return render_template('admin/api_config.html', config=current_config)
 
 @app.route('/admin/api-config/update', methods=['POST'])
@@ -341,7 +353,7 @@ def update_api_config():
                 'confidence_threshold': float(request.form.get('confidence_threshold', 0.8))
             })
         
-        success = ocr_processor.update_api_config(provider, config_data)
+        success = get_ocr_processor().update_api_config(provider, config_data)
         
         if success:
             flash(f'{provider.upper()} API配置已更新', 'success')
@@ -374,7 +386,7 @@ def download_file(filename):
 def api_status():
     """获取API状态"""
     try:
-        status = ocr_processor.get_api_status()
+        status = get_ocr_processor().get_api_status()
         return jsonify({'success': True, 'status': status})
     except Exception as e:
         logger.error(f"获取API状态时出错: {e}")
@@ -392,5 +404,8 @@ if __name__ == '__main__':
     # 创建基本模板文件
     create_basic_templates()
     
+    # 启动前加载OCR处理器（银行库等），首个请求无需等待
+    get_ocr_processor()
+    
     # 启动应用
     app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的银行库编译缓存
+首次加载时把解析后的银行库连同账号索引、银行名称自动机一起序列化到本地文件，
+之后的启动（及额外的worker进程）直接反序列化，不再用openpyxl解析Excel；
+工作簿的修改时间/大小变化时再校验内容哈希，内容确实变化才重建
+"""
+
+import os
+import pickle
+import hashlib
+from typing import Dict, Optional
+
+
+class BankDatabaseCache:
+    """银行库编译缓存文件"""
+
+    # 索引结构变化时递增，使旧缓存失效
+    FORMAT_VERSION = 3
+
+    def __init__(self, cache_path: str = "cache/bank_database.pkl"):
+        """
+        初始化缓存
+
+        Args:
+            cache_path: 缓存文件路径（只应位于本机可信目录）
+        """
+        self.cache_path = cache_path
+
+    @staticmethod
+    def _file_hash(path: str) -> str:
+        """计算工作簿内容的sha256"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def load(self, workbook_path: str, tag: Dict) -> Optional[Dict]:
+        """
+        读取与工作簿匹配的缓存
+
+        Args:
+            workbook_path: 银行库工作簿路径
+            tag: 影响缓存内容的配置（不一致时视为失效）
+
+        Returns:
+            保存时的数据，缓存不存在或已失效时返回 None
+        """
+        if not os.path.exists(self.cache_path) or not os.path.exists(workbook_path):
+            return None
+        try:
+            stat = os.stat(workbook_path)
+            with open(self.cache_path, 'rb') as f:
+                # 文件头单独序列化，失效时无需反序列化整个缓存
+                header = pickle.load(f)
+                if header.get('version') != self.FORMAT_VERSION or header.get('tag') != tag \
+                        or header.get('workbook') != os.path.abspath(workbook_path):
+                    return None
+                touched = (header.get('mtime_ns'), header.get('size')) != (stat.st_mtime_ns, stat.st_size)
+                if touched and header.get('sha256') != self._file_hash(workbook_path):
+                    return None
+                payload = pickle.load(f)
+            if touched:
+                # 内容未变（如仅被重新保存/复制），刷新文件头中的修改时间
+                self.save(workbook_path, tag, payload, sha256=header.get('sha256'))
+            return payload
+        except Exception as e:
+            print(f"读取银行库缓存失败: {e}")
+            return None
+
+    def save(self, workbook_path: str, tag: Dict, payload: Dict, sha256: str = None):
+        """原子写入缓存"""
+        try:
+            stat = os.stat(workbook_path)
+            header = {
+                'version': self.FORMAT_VERSION,
+                'tag': tag,
+                'workbook': os.path.abspath(workbook_path),
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'sha256': sha256 or self._file_hash(workbook_path)
+            }
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"写入银行库缓存失败: {e}")
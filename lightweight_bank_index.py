@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的银行库索引
+银行库加载时一次性建立 规整账号 -> 行 的哈希索引、前缀/后缀有序数组与首6位/末4位多值映射，
+并预先确定公司/银行/账号列；精确、掩码（6222 **** **** 1234）与断行片段账号都无需整表扫描；
+公司名称另建 trigram 倒排索引，账号未命中时按名称相似度定位
+"""
+
+import re
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from lightweight_company_index import CompanyNameIndex
+
+_ACCOUNT_SEPARATORS = re.compile(r'[\s-]')
+
+# 银行App中常见的账号掩码字符
+MASK_CHARS = re.compile(r'[*＊xX•●]+')
+
+
+def normalize_account(value) -> str:
+    """规整账号：去掉空白与连字符，Excel读成浮点数的整数账号去掉小数部分"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return _ACCOUNT_SEPARATORS.sub('', str(value))
+
+
+def column_role(col) -> Optional[str]:
+    """按表头判断列对应的比对字段"""
+    col_name = str(col)
+    lower = col_name.lower()
+    if '账号' in col_name or '卡号' in col_name or 'account' in lower:
+        return 'account_number_db'
+    if '公司' in col_name or 'company' in lower:
+        return 'company_name_db'
+    if '银行' in col_name or '开户行' in col_name or 'bank' in lower:
+        return 'bank_name_db'
+    return None
+
+
+def account_edit_distance(account: str, other: str) -> int:
+    """两个规整账号的编辑距离（OCR识别错、漏、多一位数字各计1）"""
+    previous = list(range(len(other) + 1))
+    for i, ch in enumerate(account, 1):
+        current = [i]
+        for j, other_ch in enumerate(other, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ch != other_ch)))
+        previous = current
+    return previous[-1]
+
+
+class BankDatabaseIndex:
+    """银行库账号索引（精确、掩码及片段匹配）"""
+
+    # 掩码/片段账号至少需要的可见数字位数，过短时候选过多没有意义
+    MIN_VISIBLE_DIGITS = 6
+    # 按公司名称定位到多行时，识别出的账号与某行账号最多相差几位才据此选定该行
+    MAX_ACCOUNT_EDITS = 2
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        建立索引
+
+        Args:
+            df: 银行库数据
+        """
+        self.df = df
+        self.row_count = len(df)
+        self.roles = [(col, column_role(col)) for col in df.columns]
+        self.account_columns = [col for col, role in self.roles if role == 'account_number_db']
+
+        # 每行需要回填的字段（同一字段有多列时取靠后的列）
+        self.records = []
+        role_columns = [(col, role) for col, role in self.roles if role]
+        for values in df[[col for col, _ in role_columns]].itertuples(index=False, name=None):
+            record = {}
+            for (_, role), value in zip(role_columns, values):
+                record[role] = str(value)
+            self.records.append(record)
+
+        # 规整账号 -> 行号列表（按行顺序）
+        self.by_account = {}
+        # 各行的全部规整账号，用于掩码/片段匹配时的二次校验
+        self.row_accounts = [[] for _ in range(self.row_count)]
+        for col in self.account_columns:
+            for row, value in enumerate(df[col].tolist()):
+                account = normalize_account(value)
+                if account and account not in self.row_accounts[row]:
+                    self.row_accounts[row].append(account)
+                    self.by_account.setdefault(account, []).append(row)
+        for rows in self.by_account.values():
+            rows.sort()
+
+        # 前缀/后缀索引：有序数组（二分查找区间）+ 前6位/后4位多值映射
+        pairs = sorted((account, row) for row, accounts in enumerate(self.row_accounts) for account in accounts)
+        self.sorted_accounts = [account for account, _ in pairs]
+        self.sorted_rows = [row for _, row in pairs]
+        reversed_pairs = sorted((account[::-1], row) for account, row in pairs)
+        self.sorted_reversed = [account for account, _ in reversed_pairs]
+        self.reversed_rows = [row for _, row in reversed_pairs]
+        self.by_first6 = {}
+        self.by_last4 = {}
+        for account, row in pairs:
+            if len(account) >= 6:
+                self.by_first6.setdefault(account[:6], []).append(row)
+            if len(account) >= 4:
+                self.by_last4.setdefault(account[-4:], []).append(row)
+
+        # 批量比对用的 规整账号 -> 行 表（按行顺序），与各行回填字段表
+        self.account_frame = pd.DataFrame({'account': self.sorted_accounts, 'row': self.sorted_rows})
+        self.account_frame = self.account_frame.sort_values(['account', 'row'], kind='stable').reset_index(drop=True)
+        self.record_frame = pd.DataFrame(self.records, index=range(self.row_count))
+
+        # 公司名称 trigram 倒排索引
+        self.company_index = CompanyNameIndex([record.get('company_name_db') for record in self.records])
+
+    def _prefix_rows(self, prefix: str) -> List[int]:
+        """账号以 prefix 开头的行"""
+        start = bisect_left(self.sorted_accounts, prefix)
+        end = bisect_left(self.sorted_accounts, prefix + '\uffff')
+        return self.sorted_rows[start:end]
+
+    def _suffix_rows(self, suffix: str) -> List[int]:
+        """账号以 suffix 结尾的行"""
+        reversed_suffix = suffix[::-1]
+        start = bisect_left(self.sorted_reversed, reversed_suffix)
+        end = bisect_left(self.sorted_reversed, reversed_suffix + '\uffff')
+        return self.reversed_rows[start:end]
+
+    def _masked_rows(self, prefix: str, suffix: str) -> List[int]:
+        """掩码账号（如 6222********1234）：按可见的首尾数字匹配"""
+        if len(suffix) >= 4:
+            candidates = self.by_last4.get(suffix[-4:], [])
+        elif len(prefix) >= 6:
+            candidates = self.by_first6.get(prefix[:6], [])
+        else:
+            # 可见部分既不足末4位也不足前6位，候选范围过大
+            return []
+        return [
+            row for row in candidates
+            if any(account.startswith(prefix) and account.endswith(suffix) for account in self.row_accounts[row])
+        ]
+
+    def find_rows(self, account_number: str) -> Tuple[List[int], Optional[str]]:
+        """
+        查找账号对应的行
+
+        Returns:
+            (按行顺序去重的行号, 匹配方式 exact/masked/partial)，未命中时为 ([], None)
+        """
+        account = normalize_account(account_number)
+        if not account:
+            return [], None
+
+        masked = MASK_CHARS.search(account)
+        if masked:
+            prefix = account[:masked.start()]
+            suffix = account[len(account.rstrip('0123456789')):]
+            if len(prefix) + len(suffix) < self.MIN_VISIBLE_DIGITS:
+                return [], None
+            rows = self._masked_rows(prefix, suffix) if self.account_columns else []
+            return sorted(set(rows)), 'masked' if rows else None
+
+        rows = self.by_account.get(account)
+        if rows:
+            return rows, 'exact'
+        if not self.account_columns:
+            # 没有识别出账号列时退回整表扫描
+            mask = self.df.astype(str).apply(lambda x: x.str.contains(account, regex=False, na=False)).any(axis=1)
+            rows = [int(row) for row in mask.to_numpy().nonzero()[0]]
+            return rows, 'partial' if rows else None
+        if len(account) < self.MIN_VISIBLE_DIGITS:
+            return [], None
+        # OCR把账号断成两行时，识别出的往往是完整账号的前段或后段
+        rows = sorted(set(self._prefix_rows(account)) | set(self._suffix_rows(account)))
+        return rows, 'partial' if rows else None
+
+    def lookup(self, account_number: str, company_name: str = None) -> Optional[Dict]:
+        """
+        返回第一条匹配行的回填字段，附带匹配方式与候选行数，未命中时返回 None
+
+        Args:
+            account_number: 识别出的账号（可含掩码字符）
+            company_name: 可选，识别出的公司名称；候选多于一行时用于缩小范围
+        """
+        rows, match_type = self.find_rows(account_number)
+        if not rows:
+            return None
+        if len(rows) > 1 and company_name:
+            narrowed = [row for row in rows if self.records[row].get('company_name_db') == company_name]
+            if narrowed:
+                rows = narrowed
+        record = dict(self.records[rows[0]])
+        record['account_match_type'] = match_type
+        record['account_candidates'] = len(rows)
+        return record
+
+    def lookup_exact_batch(self, account_numbers: List, company_names: List) -> pd.DataFrame:
+        """
+        批量精确匹配账号：向量化规整后与账号表做一次 merge，语义与逐条 lookup 的精确命中一致
+
+        Args:
+            account_numbers: 各条识别出的账号
+            company_names: 各条识别出的公司名称（候选多于一行时用于缩小范围）
+
+        Returns:
+            命中的条目：position（输入中的位置）、回填字段、account_match_type、account_candidates
+        """
+        batch = pd.DataFrame({
+            'position': range(len(account_numbers)),
+            'account': pd.Series(account_numbers, dtype=object).fillna('').astype(str)
+                         .str.replace(_ACCOUNT_SEPARATORS.pattern, '', regex=True),
+            'company_name': pd.Series(company_names, dtype=object)
+        })
+        matches = batch.merge(self.account_frame, on='account', how='inner')
+        if matches.empty:
+            return pd.DataFrame(columns=['position', 'account_match_type', 'account_candidates'])
+        matches = matches.join(self.record_frame, on='row')
+
+        # 同一账号对应多行时优先取公司名称一致的行，候选数为缩小后的行数
+        if 'company_name_db' in matches.columns:
+            matches['company_hit'] = matches['company_name'] == matches['company_name_db']
+        else:
+            matches['company_hit'] = False
+        grouped = matches.groupby('position')
+        total = grouped['row'].transform('size')
+        hits = grouped['company_hit'].transform('sum')
+        matches['account_candidates'] = hits.where(hits > 0, total).astype(int)
+        matches = matches.sort_values(['position', 'company_hit', 'row'], ascending=[True, False, True], kind='stable')
+        matches = matches.drop_duplicates('position')
+
+        matches['account_match_type'] = 'exact'
+        columns = ['position'] + list(self.record_frame.columns) + ['account_match_type', 'account_candidates']
+        return matches[columns].reset_index(drop=True)
+
+    def lookup_company(self, company_name: str, top_k: int = 5, min_score: float = 0.0,
+                       account_number: str = None) -> Optional[Dict]:
+        """
+        按公司名称相似度查找，返回最相似行的回填字段，未达到 min_score 时返回 None
+
+        同一公司有多个账户（多行）时，用识别出的账号选出编辑距离唯一最小且不超过
+        MAX_ACCOUNT_EDITS 的行；无法据此确定时 account_candidates 为该公司的行数
+
+        Args:
+            company_name: 识别出的公司名称
+            top_k: 返回的候选名称数
+            min_score: 最低相似度
+            account_number: 可选，识别出的账号（未能精确命中，可能有个别数字识别错误）
+
+        Returns:
+            回填字段，附带 company_match_score 与前 top_k 个候选 company_candidates
+        """
+        matches = self.company_index.search(company_name, top_k=top_k, min_score=min_score)
+        if not matches:
+            return None
+        rows, _, score = matches[0]
+        if len(rows) > 1:
+            rows = self._closest_account_rows(rows, account_number)
+        record = dict(self.records[rows[0]])
+        record['account_match_type'] = 'company'
+        record['account_candidates'] = len(rows)
+        record['company_match_score'] = score
+        record['company_candidates'] = [
+            {'company_name_db': self.records[candidate_rows[0]].get('company_name_db'), 'score': candidate_score}
+            for candidate_rows, _, candidate_score in matches
+        ]
+        return record
+
+    def _closest_account_rows(self, rows: List[int], account_number: str = None) -> List[int]:
+        """从同一公司的多行中选出账号与识别结果最接近的一行，无法确定时原样返回"""
+        account = MASK_CHARS.sub('', normalize_account(account_number))
+        if not account:
+            return rows
+        distances = {
+            row: min((account_edit_distance(account, candidate) for candidate in self.row_accounts[row]),
+                     default=len(account))
+            for row in rows
+        }
+        best = min(distances.values())
+        closest = [row for row in rows if distances[row] == best]
+        if best <= self.MAX_ACCOUNT_EDITS and len(closest) == 1:
+            return closest
+        return rows
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的银行名称词典匹配
+由内置银行名单与银行库中的银行名称/别名构建 Aho-Corasick 自动机，
+一次线性扫描OCR文本即可找出最长的银行名称，名单规模增大到数千条也不影响扫描速度
+"""
+
+import re
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# 内置银行名单：规范名称 -> 常见别名/简称
+BUILTIN_BANK_NAMES = {
+    "中国工商银行": ["工商银行", "工行"],
+    "中国农业银行": ["农业银行", "农行"],
+    "中国银行": ["中行"],
+    "中国建设银行": ["建设银行", "建行"],
+    "交通银行": ["交行"],
+    "中国邮政储蓄银行": ["邮政储蓄银行", "邮储银行"],
+    "招商银行": ["招行"],
+    "上海浦东发展银行": ["浦发银行", "浦发"],
+    "中信银行": [],
+    "兴业银行": [],
+    "广发银行": ["广东发展银行"],
+    "中国民生银行": ["民生银行"],
+    "中国光大银行": ["光大银行"],
+    "华夏银行": [],
+    "平安银行": [],
+    "浙商银行": [],
+    "渤海银行": [],
+    "恒丰银行": [],
+    "北京银行": [],
+    "上海银行": [],
+    "江苏银行": [],
+    "南京银行": [],
+    "宁波银行": [],
+    "杭州银行": [],
+    "徽商银行": [],
+    "长沙银行": [],
+    "成都银行": [],
+    "重庆银行": [],
+    "贵阳银行": [],
+    "青岛银行": [],
+    "郑州银行": [],
+    "苏州银行": [],
+    "厦门银行": [],
+    "西安银行": [],
+    "天津银行": [],
+    "盛京银行": [],
+    "哈尔滨银行": [],
+    "广州银行": [],
+    "汉口银行": [],
+    "北京农村商业银行": ["北京农商银行"],
+    "上海农村商业银行": ["上海农商银行"],
+    "重庆农村商业银行": ["重庆农商银行"],
+    "广州农村商业银行": ["广州农商银行"],
+    "深圳农村商业银行": ["深圳农商银行"],
+    "农村信用合作社": ["农村信用社", "农信社"],
+    "微众银行": [],
+    "网商银行": [],
+}
+
+# 银行库中别名列的分隔符
+_ALIAS_SEPARATORS = re.compile(r'[,，;；/、|\s]+')
+
+
+def bank_names_from_dataframe(df: pd.DataFrame, include_builtin: bool = True) -> Dict[str, str]:
+    """
+    从银行库中收集银行名称与别名
+
+    Returns:
+        文本中可能出现的名称 -> 规范名称
+    """
+    names = {}
+    if include_builtin:
+        for canonical, aliases in BUILTIN_BANK_NAMES.items():
+            names[canonical] = canonical
+            for alias in aliases:
+                names[alias] = canonical
+
+    if df is None or df.empty:
+        return names
+
+    name_columns = []
+    alias_columns = []
+    for col in df.columns:
+        col_name = str(col)
+        lower = col_name.lower()
+        if '别名' in col_name or '简称' in col_name or 'alias' in lower:
+            alias_columns.append(col)
+        elif '公司' in col_name or 'company' in lower or '账号' in col_name or 'account' in lower:
+            continue
+        elif '银行' in col_name or '开户行' in col_name or 'bank' in lower:
+            name_columns.append(col)
+
+    for _, row in df[name_columns + alias_columns].iterrows():
+        canonical = None
+        for col in name_columns:
+            value = row[col]
+            if pd.isna(value) or not str(value).strip():
+                continue
+            value = str(value).strip()
+            canonical = canonical or value
+            names.setdefault(value, value)
+        if canonical is None:
+            continue
+        for col in alias_columns:
+            value = row[col]
+            if pd.isna(value):
+                continue
+            for alias in _ALIAS_SEPARATORS.split(str(value)):
+                if alias:
+                    names.setdefault(alias, canonical)
+    return names
+
+
+class BankNameMatcher:
+    """银行名称 Aho-Corasick 自动机（更新时写时复制，查询无需加锁）"""
+
+    def __init__(self, names: Dict[str, str] = None):
+        """
+        初始化匹配器
+
+        Args:
+            names: 文本中可能出现的名称 -> 规范名称
+        """
+        self._names = {}
+        # 各状态对应的完整名称（仅更新时使用）
+        self._terminal = [None]
+        # (goto, fail, 各状态可匹配的最长名称长度, 对应名称, 名称 -> 规范名称)
+        self._automaton = ([{}], [0], [0], [None], {})
+        self._lock = threading.Lock()
+        self.last_build = {'mode': None, 'names': 0, 'nodes': 1, 'build_ms': 0.0}
+        if names:
+            self.update(names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def copy(self) -> 'BankNameMatcher':
+        """复制匹配器（共享只读的自动机，之后的更新互不影响）"""
+        matcher = BankNameMatcher()
+        with self._lock:
+            matcher._names = self._names
+            matcher._terminal = self._terminal
+            matcher._automaton = self._automaton
+            matcher.last_build = dict(self.last_build)
+        return matcher
+
+    def __getstate__(self) -> Dict:
+        # 序列化（编译缓存）时不保存锁
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def update(self, names: Dict[str, str]):
+        """
+        用新的名单更新自动机：仅有新增时在现有字典树上追加，有删除时整体重建
+        """
+        start = time.perf_counter()
+        with self._lock:
+            removed = any(name not in names for name in self._names)
+            if removed or not self._names:
+                goto, terminal = [{}], [None]
+                pending = names
+                mode = 'rebuild' if removed else 'build'
+            else:
+                goto = [dict(edges) for edges in self._automaton[0]]
+                terminal = list(self._terminal)
+                pending = {name: canonical for name, canonical in names.items() if name not in self._names}
+                mode = 'incremental'
+                if not pending and names == self._names:
+                    return
+
+            for name in pending:
+                self._insert(goto, terminal, name)
+            fail, best_length, best_name = self._link(goto, terminal)
+
+            self._names = dict(names)
+            self._terminal = terminal
+            self._automaton = (goto, fail, best_length, best_name, self._names)
+            self.last_build = {
+                'mode': mode,
+                'names': len(names),
+                'added': len(pending) if mode == 'incremental' else len(names),
+                'nodes': len(goto),
+                'build_ms': (time.perf_counter() - start) * 1000
+            }
+
+    @staticmethod
+    def _insert(goto: List[Dict], terminal: List[Optional[str]], name: str):
+        state = 0
+        for ch in name:
+            next_state = goto[state].get(ch)
+            if next_state is None:
+                next_state = len(goto)
+                goto[state][ch] = next_state
+                goto.append({})
+                terminal.append(None)
+            state = next_state
+        terminal[state] = name
+
+    @staticmethod
+    def _link(goto: List[Dict], terminal: List[Optional[str]]) -> Tuple[List[int], List[int], List[Optional[str]]]:
+        """广度优先计算失配指针，以及每个状态结尾处可匹配的最长名称"""
+        fail = [0] * len(goto)
+        best_length = [0] * len(goto)
+        best_name = [None] * len(goto)
+        queue = []
+        for state in goto[0].values():
+            queue.append(state)
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            # 自身是完整名称时一定最长；否则沿用失配状态上的最长名称
+            if terminal[state] is not None:
+                best_length[state] = len(terminal[state])
+                best_name[state] = terminal[state]
+            else:
+                best_length[state] = best_length[fail[state]]
+                best_name[state] = best_name[fail[state]]
+            for ch, child in goto[state].items():
+                fallback = fail[state]
+                while fallback and ch not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(ch, 0)
+                fail[child] = target if target != child else 0
+                queue.append(child)
+        return fail, best_length, best_name
+
+    def find_longest(self, text: str) -> Optional[Tuple[str, str]]:
+        """
+        找出文本中最长的银行名称（等长时取最靠前的）
+
+        Returns:
+            (文本中的名称, 规范名称)，未命中时返回 None
+        """
+        goto, fail, best_length, best_name, canonical_names = self._automaton
+        root = goto[0]
+        state = 0
+        found = None
+        found_length = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0) if state else root.get(ch, 0)
+            if best_length[state] > found_length:
+                found_length = best_length[state]
+                found = best_name[state]
+        if found is None:
+            return None
+        return found, canonical_names.get(found, found)
+
+    def get_stats(self) -> Dict:
+        """获取自动机规模与最近一次构建耗时"""
+        return dict(self.last_build)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的银行库热加载
+银行库连同其索引打包为不可变的"代"，新代在后台构建完成后以一次引用赋值原子替换；
+处理中的请求持有旧代的引用，始终看到一致的快照，旧代在无人引用后由垃圾回收释放
+"""
+
+import os
+import glob
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from lightweight_bank_index import BankDatabaseIndex
+from lightweight_bank_matcher import BankNameMatcher
+
+
+def resolve_workbook_path(path_pattern: str) -> str:
+    """解析银行库路径；含通配符时取修改时间最新的工作簿"""
+    if not glob.has_magic(path_pattern):
+        return path_pattern
+    candidates = glob.glob(path_pattern)
+    if not candidates:
+        return path_pattern
+    return max(candidates, key=lambda path: (os.path.getmtime(path), path))
+
+
+def workbook_signature(path: str) -> Optional[Tuple[str, int, int]]:
+    """工作簿的 (路径, 修改时间, 大小)，文件不存在时为 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+class BankDataGeneration:
+    """一代银行库数据：DataFrame、账号索引与银行名称匹配器，构建后不再修改"""
+
+    def __init__(self, generation: int, bank_index: BankDatabaseIndex, bank_matcher: BankNameMatcher,
+                 workbook_path: str, signature: Optional[Tuple[str, int, int]], source: str, build_ms: float):
+        """
+        Args:
+            generation: 代号（单调递增）
+            bank_index: 账号索引（其 df 即银行库数据）
+            bank_matcher: 银行名称匹配器
+            workbook_path: 工作簿路径
+            signature: 构建时工作簿的 (路径, 修改时间, 大小)
+            source: 数据来源 workbook/cache/empty
+            build_ms: 构建耗时（毫秒）
+        """
+        self.generation = generation
+        self.bank_index = bank_index
+        self.bank_database = bank_index.df
+        self.bank_matcher = bank_matcher
+        self.workbook_path = workbook_path
+        self.signature = signature
+        self.source = source
+        self.build_ms = build_ms
+        self.built_at = datetime.now()
+
+    @classmethod
+    def empty(cls) -> 'BankDataGeneration':
+        """尚未加载银行库时使用的空代"""
+        return cls(0, BankDatabaseIndex(pd.DataFrame()), BankNameMatcher(), '', None, 'empty', 0.0)
+
+    def get_status(self) -> Dict:
+        """代的摘要信息（管理后台展示用）"""
+        return {
+            'generation': self.generation,
+            'workbook': os.path.basename(self.workbook_path) if self.workbook_path else '',
+            'records': len(self.bank_database),
+            'bank_names': len(self.bank_matcher),
+            'source': self.source,
+            'build_ms': round(self.build_ms, 1),
+            'built_at': self.built_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+
+class BankDatabaseWatcher:
+    """后台轮询银行库工作簿，发现新增或变化时触发重新加载"""
+
+    def __init__(self, processor, interval: float = 30):
+        """
+        Args:
+            processor: LightweightOCRProcessor 实例
+            interval: 轮询间隔（秒）
+        """
+        self.processor = processor
+        self.interval = interval
+        self._stop_event = threading.Event()
+        # 上一次轮询看到的签名：连续两次一致才加载，避免读到尚未写完的文件
+        self._pending_signature = None
+        self._failed_signature = None
+        self._thread = threading.Thread(target=self._run, name="bank-db-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                path_pattern = self.processor.config.get("bank_database", {}).get("path", "公司在用银行库*.xlsx")
+                signature = workbook_signature(resolve_workbook_path(path_pattern))
+                if signature is None or signature in (self.processor.bank_data.signature, self._failed_signature):
+                    self._pending_signature = None
+                    continue
+                if signature != self._pending_signature:
+                    self._pending_signature = signature
+                    continue
+                print(f"检测到银行库变化，后台重新加载: {signature[0]}")
+                if not self.processor.reload_bank_database():
+                    self._failed_signature = signature
+                self._pending_signature = None
+            except Exception as e:
+                print(f"银行库监控失败: {e}")
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的公司名称模糊索引
+对银行库公司名称列建立字符三元组（trigram）倒排索引，按 Dice 相似度返回前 k 个候选；
+账号被OCR识别错一两位时可改用公司名称定位行，也可用于核对账号命中行的公司名称
+"""
+
+import re
+from typing import List, Tuple
+
+# 比对前去掉的空白与标点（全角括号等统一忽略）
+_NAME_NOISE = re.compile(r'[\s　·.,，、:：;；\'"“”‘’()（）\[\]【】<>《》-]+')
+
+# 几乎每条记录都有的组织形式后缀，不参与相似度计算
+_LEGAL_SUFFIXES = re.compile(r'(股份有限公司|有限责任公司|有限公司|分公司|公司)$')
+
+
+def normalize_company_name(value) -> str:
+    """规整公司名称：去掉空白、标点与组织形式后缀"""
+    if value is None:
+        return ''
+    name = _NAME_NOISE.sub('', str(value))
+    if name.lower() in ('', 'nan', 'none'):
+        return ''
+    core = _LEGAL_SUFFIXES.sub('', name)
+    # 只剩后缀时保留原名
+    return core or name
+
+
+def name_grams(name: str) -> frozenset:
+    """名称的字符三元组集合（首尾补边界符，短名称也能产生特征）"""
+    padded = f"\x02{name}\x03"
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _dice(grams: frozenset, other: frozenset) -> float:
+    if not grams or not other:
+        return 0.0
+    return 2 * len(grams & other) / (len(grams) + len(other))
+
+
+class CompanyNameIndex:
+    """公司名称 trigram 倒排索引"""
+
+    # 出现在超过该比例名称中的三元组只用于计分，不用于生成候选
+    MAX_POSTING_RATIO = 0.05
+    # 候选生成时倒排表长度的下限（小库不跳过任何三元组）
+    MIN_POSTING_CAP = 64
+    # 按共享三元组数粗筛后精算相似度的候选数
+    RESCORE_LIMIT = 50
+
+    def __init__(self, names: List[str]):
+        """
+        建立索引
+
+        Args:
+            names: 各行的公司名称（下标即行号）
+        """
+        # 相同名称只建一次，名称编号 -> 行号列表
+        self.names = []
+        self.name_rows = []
+        self.name_grams = []
+        ids = {}
+        for row, value in enumerate(names):
+            name = normalize_company_name(value)
+            if not name:
+                continue
+            name_id = ids.get(name)
+            if name_id is None:
+                name_id = ids[name] = len(self.names)
+                self.names.append(name)
+                self.name_rows.append([])
+                self.name_grams.append(name_grams(name))
+            self.name_rows[name_id].append(row)
+
+        self.postings = {}
+        for name_id, grams in enumerate(self.name_grams):
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(name_id)
+        self.posting_cap = max(self.MIN_POSTING_CAP, int(len(self.names) * self.MAX_POSTING_RATIO))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(self, company_name: str, top_k: int = 5, min_score: float = 0.0) -> List[Tuple[List[int], str, float]]:
+        """
+        按相似度查找公司名称
+
+        只遍历查询名称中三元组的倒排表（过长的倒排表跳过），
+        耗时取决于查询长度而非银行库行数
+
+        Returns:
+            [(行号列表, 规整后的库内名称, 相似度)]，按相似度降序
+        """
+        name = normalize_company_name(company_name)
+        if not name or not self.names:
+            return []
+        grams = name_grams(name)
+
+        shared = {}
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if not posting or len(posting) > self.posting_cap:
+                continue
+            for name_id in posting:
+                shared[name_id] = shared.get(name_id, 0) + 1
+        if not shared:
+            return []
+
+        if len(shared) > self.RESCORE_LIMIT:
+            rough = sorted(shared.items(), key=lambda item: -item[1])[:self.RESCORE_LIMIT]
+        else:
+            rough = shared.items()
+        scored = []
+        for name_id, _ in rough:
+            score = _dice(grams, self.name_grams[name_id])
+            if score >= min_score:
+                scored.append((score, name_id))
+        scored.sort(key=lambda item: (-item[0], self.name_rows[item[1]][0]))
+        return [(self.name_rows[name_id], self.names[name_id], round(score, 4)) for score, name_id in scored[:top_k]]
+
+    @staticmethod
+    def similarity(name: str, other: str) -> float:
+        """两个公司名称的相似度（0~1）"""
+        name, other = normalize_company_name(name), normalize_company_name(other)
+        if not name or not other:
+            return 0.0
+        if name == other:
+            return 1.0
+        return round(_dice(name_grams(name), name_grams(other)), 4)
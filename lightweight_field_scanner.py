@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的字段抽取器
+配置中的抽取规则在加载（及更新）时一次性编译；每条规则附带从正则语法树中
+推导出的必需字面量，文本中不含这些字面量时直接跳过该规则，避免无谓的回溯扫描
+"""
+
+import re
+from typing import Dict, List, Optional
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+# 字段名 -> 配置中对应的规则列表
+FIELD_RULES = (
+    ('bank_name', 'bank_name_patterns'),
+    ('company_name', 'company_patterns'),
+    ('account_number', 'account_patterns'),
+    ('balance', 'balance_patterns'),
+)
+
+_ACCOUNT_SEPARATORS = re.compile(r'[\s-]')
+_BALANCE_SYMBOLS = re.compile(r'[¥￥,]')
+
+
+def _required_literals(parsed) -> List[List[str]]:
+    """
+    推导正则匹配成功时文本中必须出现的字面量
+
+    Returns:
+        字面量组列表：每组内至少出现一个（来自分支），所有组都必须满足
+    """
+    groups = []
+    run = []
+
+    def flush():
+        if run:
+            groups.append([''.join(run)])
+            run.clear()
+
+    for op, av in parsed:
+        name = str(op)
+        if name == 'LITERAL':
+            run.append(chr(av))
+            continue
+        flush()
+        if name == 'SUBPATTERN':
+            # (?i:...) 等局部忽略大小写的分组：字面量大小写不确定，不参与预筛
+            add_flags = av[1] if len(av) == 4 else 0
+            if not add_flags & re.IGNORECASE:
+                groups.extend(_required_literals(av[-1]))
+        elif name == 'BRANCH':
+            alternatives = []
+            for branch in av[1]:
+                candidates = [group[0] for group in _required_literals(branch) if len(group) == 1]
+                if not candidates:
+                    alternatives = None
+                    break
+                alternatives.append(max(candidates, key=len))
+            if alternatives:
+                groups.append(alternatives)
+        elif name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') and av[0] >= 1:
+            groups.extend(_required_literals(av[2]))
+    flush()
+    return groups
+
+
+class _CompiledRule:
+    """单条已编译的抽取规则"""
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.regex = re.compile(pattern)
+        self.literal_groups = []
+        if not self.regex.flags & re.IGNORECASE:
+            try:
+                self.literal_groups = _required_literals(sre_parse.parse(pattern))
+            except Exception:
+                self.literal_groups = []
+        if 'value' in self.regex.groupindex:
+            self.value_group = 'value'
+        else:
+            self.value_group = 1 if self.regex.groups else 0
+
+    def search(self, text: str) -> Optional[str]:
+        """返回第一个匹配的取值，文本缺少必需字面量时直接返回 None"""
+        for group in self.literal_groups:
+            if not any(literal in text for literal in group):
+                return None
+        match = self.regex.search(text)
+        if match is None:
+            return None
+        return match.group(self.value_group)
+
+
+class FieldScanner:
+    """按字段组织的预编译抽取规则，每个字段命中第一条有效规则即停止"""
+
+    def __init__(self, extraction_rules: Dict):
+        """
+        编译抽取规则
+
+        Args:
+            extraction_rules: 配置中的 extraction_rules 节点；规则可用命名分组 (?P<value>...) 指定取值
+        """
+        self.rules = {}
+        for field, rules_key in FIELD_RULES:
+            compiled = []
+            for pattern in extraction_rules.get(rules_key, []):
+                try:
+                    compiled.append(_CompiledRule(pattern))
+                except re.error as e:
+                    print(f"抽取规则编译失败，已忽略: {pattern} ({e})")
+            self.rules[field] = compiled
+
+    def scan(self, text: str) -> Dict:
+        """从文本中抽取各字段，未命中的字段为 None"""
+        fields = {}
+        for field, _ in FIELD_RULES:
+            fields[field] = None
+            for rule in self.rules[field]:
+                value = rule.search(text)
+                if value is None:
+                    continue
+                value = self._normalize(field, value)
+                if value is not None:
+                    fields[field] = value
+                    break
+        return fields
+
+    @staticmethod
+    def _normalize(field: str, value: str):
+        """字段取值规整，不合格时返回 None 以继续尝试下一条规则"""
+        if field == 'account_number':
+            account = _ACCOUNT_SEPARATORS.sub('', value)
+            return account if len(account) >= 10 else None
+        if field == 'balance':
+            try:
+                return float(_BALANCE_SYMBOLS.sub('', value))
+            except ValueError:
+                return None
+        return value
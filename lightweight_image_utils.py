@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的图像工具
+预处理结果以原始字节保存，仅在服务商需要时才惰性编码为base64；
+支持按服务商的体积限制分别选择格式与压缩质量，以及裁剪出文字密集区域
+"""
+
+import os
+import io
+import base64
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from lightweight_ocr_cache import compute_dhash, compute_verification_thumbnail
+
+
+class ImagePayload:
+    """预处理后的图像数据：原始编码字节 + 按需生成的base64"""
+
+    def __init__(self, raw: bytes, image_format: str = "JPEG", size: Tuple[int, int] = (0, 0)):
+        """
+        初始化图像数据
+
+        Args:
+            raw: 编码后的图像字节（JPEG/PNG等）
+            image_format: 图像格式
+            size: 图像宽高
+        """
+        self.raw = raw
+        self.format = image_format
+        self.size = size
+        self.dhash = None
+        self.thumbnail = None
+        self.variants = {}
+        self.tiles = []
+        self.tile_overlap = []
+        self._base64 = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def __getstate__(self) -> Dict:
+        # 跨进程传递时不序列化锁
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.raw) or bool(self.tiles)
+
+    @classmethod
+    def from_tiles(cls, tiles: List['ImagePayload'], size: Tuple[int, int],
+                   overlap: Optional[List[float]] = None) -> 'ImagePayload':
+        """
+        由多个分块组成的图像数据（本身不含编码字节）
+
+        Args:
+            overlap: 各分块顶部与上一分块重叠部分占该分块高度的比例，分块互不重叠时为 None
+        """
+        payload = cls(b"", tiles[0].format if tiles else "JPEG", size)
+        payload.tiles = tiles
+        payload.tile_overlap = overlap or []
+        return payload
+
+    def for_provider(self, provider: str) -> 'ImagePayload':
+        """获取为指定服务商单独编码的版本，没有时返回默认版本"""
+        return self.variants.get(provider, self)
+
+    @property
+    def base64(self) -> str:
+        """base64编码结果（首次访问时编码并缓存）"""
+        if self._base64 is None:
+            with self._lock:
+                if self._base64 is None:
+                    self._base64 = base64.b64encode(self.raw).decode('ascii')
+        return self._base64
+
+
+# Image.reduce 支持的色彩模式
+REDUCIBLE_MODES = {'L', 'LA', 'RGB', 'RGBA', 'CMYK', 'F'}
+
+
+def fast_downscale(img: Image.Image, max_size: int, reducing_gap: float = 2.0) -> Image.Image:
+    """
+    快速缩小大图：JPEG在DCT域按1/2、1/4、1/8草稿解码，再用整数倍 reduce 缩小，
+    保留约 reducing_gap 倍余量给最终的高质量重采样
+
+    Args:
+        img: 刚打开、尚未解码的PIL图像
+        max_size: 目标最长边
+        reducing_gap: 快速缩小后相对目标尺寸保留的倍数
+    """
+    longest = max(img.size)
+    if longest <= max_size * reducing_gap:
+        return img
+
+    scale = max_size * reducing_gap / longest
+    if img.format == 'JPEG':
+        img.draft(img.mode, (int(img.size[0] * scale), int(img.size[1] * scale)))
+
+    factor = int(max(img.size) / (max_size * reducing_gap))
+    if factor >= 2:
+        # reduce 不支持调色板（P）、二值（1）与16/32位整数等模式，先按原流程转为RGB
+        if img.mode not in REDUCIBLE_MODES:
+            img = img.convert('RGB')
+        img = img.reduce(factor)
+    return img
+
+
+class PayloadEncoder:
+    """对同一张已解码图像做多格式编码，缓存编码结果供各服务商复用"""
+
+    # 各格式的保存参数
+    SAVE_OPTIONS = {
+        'JPEG': {'optimize': True},
+        'PNG': {'compress_level': 6},
+        'WEBP': {'method': 1}
+    }
+    LOSSLESS_FORMATS = {'PNG'}
+
+    def __init__(self, img: Image.Image):
+        """
+        初始化编码器
+
+        Args:
+            img: 已完成解码和基础缩放的RGB图像
+        """
+        self.img = img
+        self._images = {}
+        self._encoded = {}
+
+    def _image(self, scale: float, grayscale: bool) -> Image.Image:
+        """获取指定缩放比例与色彩模式的图像（缓存）"""
+        key = (round(scale, 4), grayscale)
+        if key not in self._images:
+            img = self.img
+            if scale < 1.0:
+                new_size = tuple(max(int(dim * scale), 1) for dim in img.size)
+                img = img.resize(new_size, Image.Resampling.LANCZOS)
+            if grayscale:
+                img = img.convert('L')
+            self._images[key] = img
+        return self._images[key]
+
+    def encode(self, image_format: str, quality: Optional[int], scale: float = 1.0) -> ImagePayload:
+        """
+        按格式编码图像（缓存）
+
+        Args:
+            image_format: 格式，如 JPEG、PNG、WEBP，带 _GRAY 后缀表示灰度
+            quality: 有损格式的压缩质量，无损格式忽略
+            scale: 相对基础图像的缩放比例
+        """
+        base_format, _, suffix = image_format.upper().partition('_')
+        grayscale = suffix == 'GRAY'
+        if base_format in self.LOSSLESS_FORMATS:
+            quality = None
+        key = (base_format, grayscale, quality, round(scale, 4))
+        if key not in self._encoded:
+            img = self._image(scale, grayscale)
+            options = dict(self.SAVE_OPTIONS.get(base_format, {}))
+            if quality is not None:
+                options['quality'] = quality
+            buffer = io.BytesIO()
+            img.save(buffer, format=base_format, **options)
+            self._encoded[key] = ImagePayload(buffer.getvalue(), base_format, img.size)
+        return self._encoded[key]
+
+    def _best_quality(self, image_format: str, scale: float, budget: int,
+                      max_quality: int, min_quality: int) -> ImagePayload:
+        """在质量区间内二分查找不超过预算的最高质量编码"""
+        payload = self.encode(image_format, max_quality, scale)
+        base_format = image_format.upper().partition('_')[0]
+        if len(payload) <= budget or base_format in self.LOSSLESS_FORMATS:
+            return payload
+
+        best = None
+        low, high = min_quality, max_quality - 1
+        while low <= high:
+            quality = (low + high) // 2
+            candidate = self.encode(image_format, quality, scale)
+            if len(candidate) <= budget:
+                best = candidate
+                low = quality + 1
+            else:
+                high = quality - 1
+        return best or self.encode(image_format, min_quality, scale)
+
+    def fit(self, profile: Dict, default_quality: int) -> ImagePayload:
+        """
+        为服务商选择格式与质量：优先按格式顺序满足目标体积，
+        否则取不超过硬上限的最小编码，仍超限时逐步缩小尺寸
+
+        Args:
+            profile: 服务商体积配置（formats / target_bytes / max_bytes / max_side / min_quality）
+            default_quality: 默认压缩质量（也是质量搜索的上限）
+        """
+        formats: List[str] = profile.get("formats", ["JPEG"])
+        max_bytes = profile.get("max_bytes", 4 * 1024 * 1024)
+        target_bytes = profile.get("target_bytes", max_bytes)
+        min_quality = profile.get("min_quality", 50)
+        max_side = profile.get("max_side")
+
+        scale = 1.0
+        if max_side and max(self.img.size) > max_side:
+            scale = max_side / max(self.img.size)
+
+        smallest = None
+        for _ in range(4):
+            for image_format in formats:
+                payload = self._best_quality(image_format, scale, target_bytes, default_quality, min_quality)
+                if len(payload) <= target_bytes:
+                    return payload
+                if smallest is None or len(payload) < len(smallest):
+                    smallest = payload
+            if len(smallest) <= max_bytes:
+                return smallest
+            scale *= 0.75
+        return smallest
+
+
+def find_text_bands(img: Image.Image, analysis_width: int = 360, edge_threshold: int = 40,
+                    min_density: float = 0.02, gap_ratio: float = 0.01,
+                    margin_ratio: float = 0.01) -> List[Tuple[int, int, int, int]]:
+    """
+    用投影轮廓查找文字密集的水平条带
+
+    在缩小的灰度副本上计算相邻像素的水平梯度，梯度点占比高的行视为文字行，
+    相邻文字行合并为条带，再按条带内的列投影收紧左右边界
+
+    Args:
+        img: 原始图像
+        analysis_width: 分析用副本的宽度
+        edge_threshold: 判定为边缘的灰度差
+        min_density: 文字行的最低边缘点占比
+        gap_ratio: 允许合并的行间空白（占图像高度比例）
+        margin_ratio: 条带四周保留的边距（占图像高度比例）
+
+    Returns:
+        原图坐标下的 (left, top, right, bottom) 列表
+    """
+    scale = min(analysis_width / img.width, 1.0)
+    small = img
+    if scale < 1.0:
+        small = img.resize((analysis_width, max(int(img.height * scale), 1)), Image.Resampling.BILINEAR)
+    gray = np.asarray(small.convert('L'), dtype=np.int16)
+    height, width = gray.shape
+    if height < 2 or width < 2:
+        return []
+
+    edges = np.abs(np.diff(gray, axis=1)) > edge_threshold
+    text_rows = np.flatnonzero(edges.mean(axis=1) >= min_density)
+    if text_rows.size == 0:
+        return []
+
+    gap = max(int(height * gap_ratio), 1)
+    margin = max(int(height * margin_ratio), 1)
+    splits = np.flatnonzero(np.diff(text_rows) > gap)
+    starts = np.concatenate(([text_rows[0]], text_rows[splits + 1]))
+    ends = np.concatenate((text_rows[splits], [text_rows[-1]]))
+
+    # 加上边距后重叠的条带合并为一个
+    row_ranges = []
+    for start, end in zip(starts, ends):
+        if end - start < 1:
+            continue  # 单行噪点
+        top = max(start - margin, 0)
+        bottom = min(end + margin + 1, height)
+        if row_ranges and top <= row_ranges[-1][1]:
+            row_ranges[-1][1] = bottom
+        else:
+            row_ranges.append([top, bottom])
+
+    bands = []
+    for top, bottom in row_ranges:
+        columns = np.flatnonzero(edges[top:bottom].any(axis=0))
+        left = max(columns[0] - margin, 0)
+        right = min(columns[-1] + margin + 2, width)
+        bands.append((
+            int(left / scale), int(top / scale),
+            min(int(np.ceil(right / scale)), img.width), min(int(np.ceil(bottom / scale)), img.height)
+        ))
+    return bands
+
+
+def text_band_crops(img: Image.Image, options: Dict) -> List[Image.Image]:
+    """
+    裁剪出文字密集条带，收益不明显（未找到或覆盖面积过大）时返回空列表
+
+    Args:
+        img: RGB图像
+        options: 裁剪配置（对应配置文件中的 text_crop 节点）
+    """
+    bands = find_text_bands(
+        img,
+        analysis_width=options.get("analysis_width", 360),
+        edge_threshold=options.get("edge_threshold", 40),
+        min_density=options.get("min_density", 0.02),
+        gap_ratio=options.get("gap_ratio", 0.01),
+        margin_ratio=options.get("margin_ratio", 0.01)
+    )
+    if not bands:
+        return []
+
+    kept_area = sum((right - left) * (bottom - top) for left, top, right, bottom in bands)
+    if kept_area > img.width * img.height * options.get("max_coverage", 0.85):
+        return []
+    return [img.crop(band) for band in bands]
+
+
+def stitch_vertically(images: List[Image.Image], separator: int = 8) -> Image.Image:
+    """将多张图像左对齐纵向拼接到白色画布上"""
+    canvas_width = max(image.width for image in images)
+    canvas_height = sum(image.height for image in images) + separator * (len(images) - 1)
+    canvas = Image.new('RGB', (canvas_width, canvas_height), 'white')
+
+    offset = 0
+    for image in images:
+        canvas.paste(image, (0, offset))
+        offset += image.height + separator
+    return canvas
+
+
+def crop_to_text_bands(img: Image.Image, options: Dict) -> Image.Image:
+    """只保留文字密集条带并纵向拼接，收益不明显时返回原图"""
+    crops = text_band_crops(img, options)
+    if not crops:
+        return img
+    return stitch_vertically(crops, options.get("separator", 8))
+
+
+def split_into_tiles(height: int, tile_height: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    将高度切分为互相重叠的水平分块
+
+    Returns:
+        (top, bottom) 列表，相邻分块重叠 overlap 像素
+    """
+    if height <= tile_height:
+        return [(0, height)]
+    step = max(tile_height - overlap, 1)
+    tiles = []
+    top = 0
+    while True:
+        bottom = min(top + tile_height, height)
+        tiles.append((top, bottom))
+        if bottom >= height:
+            break
+        top += step
+    return tiles
+
+class ImagePreprocessor:
+    """图像预处理器：解码、缩放、裁剪/分块并编码，只依赖配置，可在子进程中运行"""
+
+    def __init__(self, config: Dict):
+        """
+        初始化预处理器
+
+        Args:
+            config: 处理器配置（与 LightweightOCRProcessor.config 共享）
+        """
+        self.config = config
+
+    def _near_duplicate_enabled(self) -> bool:
+        """是否需要计算近重复检测用的感知哈希"""
+        return self.config.get("near_duplicate", {}).get("enabled", False)
+
+    def _enabled_providers(self) -> List[str]:
+        """获取已启用的OCR服务商列表"""
+        return [provider for provider, config in self.config["ocr_apis"].items() if config.get("enabled")]
+
+    def preprocess(self, image_path: str) -> Optional[ImagePayload]:
+        """图像预处理，返回编码后的原始字节（base64由需要的服务商惰性生成）"""
+        try:
+            preprocessing = self.config["image_preprocessing"]
+            max_size = preprocessing["max_size"]
+
+            with Image.open(image_path) as img:
+                if preprocessing.get("passthrough", False):
+                    payload = self._passthrough_image(image_path, img)
+                    if payload is not None:
+                        return payload
+
+                tiling = self._should_tile(img.size)
+                if preprocessing.get("fast_downscale", True) and not tiling:
+                    img = fast_downscale(img, max_size, preprocessing.get("reducing_gap", 2.0))
+
+                if img.mode != 'RGB':
+                    img = img.convert('RGB')
+
+                signature = self._near_duplicate_signature(img)
+
+                if tiling:
+                    payload = self._build_tiled_payload(img)
+                    payload.dhash, payload.thumbnail = signature
+                    return payload
+
+                text_crop_config = self.config.get("text_crop", {})
+                if text_crop_config.get("enabled", False):
+                    if text_crop_config.get("mode", "stitch") == "tiles":
+                        crops = text_band_crops(img, text_crop_config)
+                        if crops:
+                            payload = ImagePayload.from_tiles(
+                                [self._encode_image(self._fit_max_size(crop)) for crop in crops],
+                                img.size
+                            )
+                            payload.dhash, payload.thumbnail = signature
+                            return payload
+                    else:
+                        img = crop_to_text_bands(img, text_crop_config)
+
+                payload = self._encode_image(self._fit_max_size(img))
+                payload.dhash, payload.thumbnail = signature
+                return payload
+
+        except Exception as e:
+            print(f"图像预处理失败: {e}")
+            return None
+
+    def _fit_max_size(self, img: Image.Image) -> Image.Image:
+        """按 max_size 等比缩小图像"""
+        max_size = self.config["image_preprocessing"]["max_size"]
+        if max(img.size) > max_size:
+            ratio = max_size / max(img.size)
+            new_size = tuple(int(dim * ratio) for dim in img.size)
+            img = img.resize(new_size, Image.Resampling.LANCZOS)
+        return img
+
+    def _encode_image(self, img: Image.Image) -> ImagePayload:
+        """按配置编码图像（启用体积预算时为各服务商分别编码）"""
+        preprocessing = self.config["image_preprocessing"]
+        if preprocessing.get("provider_budgeting", False):
+            return self._build_provider_payloads(img)
+
+        image_format = preprocessing["format"]
+        buffer = io.BytesIO()
+        img.save(buffer,
+                format=image_format,
+                quality=preprocessing["quality"])
+        return ImagePayload(buffer.getvalue(), image_format, img.size)
+
+    def _should_tile(self, size) -> bool:
+        """超长截图（会被 max_size 明显压缩）是否切分为分块识别"""
+        tiling_config = self.config.get("tiling", {})
+        if not tiling_config.get("enabled", False):
+            return False
+        width, height = size
+        return height > self.config["image_preprocessing"]["max_size"] \
+            and height >= width * tiling_config.get("min_aspect_ratio", 2.5)
+
+    def _build_tiled_payload(self, img: Image.Image) -> ImagePayload:
+        """将超长截图切分为互相重叠的水平分块并分别编码"""
+        tiling_config = self.config.get("tiling", {})
+        tile_height = tiling_config.get("tile_height", 2400)
+        overlap = tiling_config.get("overlap", 200)
+
+        tiles = []
+        overlap_ratios = []
+        previous_bottom = 0
+        for top, bottom in split_into_tiles(img.height, tile_height, overlap):
+            tile = self._fit_max_size(img.crop((0, top, img.width, bottom)))
+            tiles.append(self._encode_image(tile))
+            overlap_ratios.append(max(previous_bottom - top, 0) / (bottom - top))
+            previous_bottom = bottom
+
+        print(f"超长截图 {img.size} 切分为 {len(tiles)} 个分块")
+        return ImagePayload.from_tiles(tiles, img.size, overlap_ratios)
+
+    def _build_provider_payloads(self, img: Image.Image) -> ImagePayload:
+        """一次解码，按各启用服务商的体积配置分别选择格式与质量"""
+        preprocessing = self.config["image_preprocessing"]
+        encoder = PayloadEncoder(img)
+        payload = encoder.encode(preprocessing["format"], preprocessing["quality"])
+
+        profiles = self.config.get("provider_payloads", {})
+        for provider in self._enabled_providers():
+            if provider not in profiles:
+                continue
+            variant = encoder.fit(profiles[provider], preprocessing["quality"])
+            if len(variant) > profiles[provider].get("max_bytes", 4194304):
+                print(f"{provider} 图像编码后仍超过体积上限: {len(variant)} 字节")
+            payload.variants[provider] = variant
+        return payload
+
+    def _passthrough_image(self, image_path: str, img: Image.Image) -> Optional[ImagePayload]:
+        """原图已满足尺寸、字节数与格式要求时直接上传原始字节，跳过解码和重编码"""
+        preprocessing = self.config["image_preprocessing"]
+        if img.format not in preprocessing.get("passthrough_formats", ["JPEG", "PNG"]):
+            return None
+        if max(img.size) > preprocessing["max_size"]:
+            return None
+        if os.path.getsize(image_path) > preprocessing.get("passthrough_max_bytes", 3145728):
+            return None
+
+        with open(image_path, 'rb') as f:
+            raw = f.read()
+        payload = ImagePayload(raw, img.format, img.size)
+        if self._near_duplicate_enabled():
+            payload.dhash, payload.thumbnail = self._near_duplicate_signature(fast_downscale(img, 512, 1.0))
+        return payload
+
+    def _near_duplicate_signature(self, img: Image.Image) -> Tuple[Optional[int], Optional[Tuple]]:
+        """计算近重复检测用的感知哈希与复核缩略图，未启用时返回 (None, None)"""
+        if not self._near_duplicate_enabled():
+            return None, None
+        near_duplicate_config = self.config.get("near_duplicate", {})
+        dhash = compute_dhash(
+            img,
+            hash_size=near_duplicate_config.get("hash_size", 32),
+            ignore_top_ratio=near_duplicate_config.get("ignore_top_ratio", 0.05),
+            tolerance=near_duplicate_config.get("tolerance", 4)
+        )
+        thumbnail = compute_verification_thumbnail(img, near_duplicate_config.get("verify_width", 270))
+        return dhash, thumbnail
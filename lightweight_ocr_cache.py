@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的识别结果缓存
+按图像内容寻址，避免重复上传的截图再次调用付费OCR接口；
+存储层可选进程内存、SQLite或Redis（多副本共享）；
+近重复截图由感知哈希召回候选，再逐像素比对缩略图确认只有状态栏不同
+"""
+
+import os
+import json
+import time
+import zlib
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    import redis
+except ImportError:  # 仅在使用Redis缓存后端时需要
+    redis = None
+
+
+class CacheBackend:
+    """缓存后端接口：字符串键值存储，支持TTL"""
+
+    name = "base"
+
+    def get(self, key: str) -> Optional[str]:
+        """读取值，未命中或已过期时返回 None"""
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: int):
+        """写入值，ttl 为有效期（秒）"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """删除键"""
+        raise NotImplementedError
+
+    def get_stats(self) -> Dict:
+        """获取后端容量统计"""
+        return {'backend': self.name}
+
+    def close(self):
+        """释放后端资源"""
+
+
+class MemoryCacheBackend(CacheBackend):
+    """进程内存缓存后端（LRU淘汰 + TTL过期）"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 256 * 1024 * 1024):
+        """
+        初始化内存缓存
+
+        Args:
+            max_entries: 最多保留的条目数
+            max_bytes: 缓存内容总字节数上限
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.time() >= expires_at:
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (value, time.time() + ttl)
+            self._total_bytes += len(value.encode('utf-8'))
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._total_bytes > self.max_bytes):
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._pop(key)
+
+    def _pop(self, key: str):
+        """删除条目并更新字节计数（调用方需持有锁）"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= len(entry[0].encode('utf-8'))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {'backend': self.name, 'entries': len(self._entries), 'bytes': self._total_bytes}
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """SQLite缓存后端（LRU淘汰 + TTL过期），同机多进程共享"""
+
+    name = "sqlite"
+
+    def __init__(self, db_path: str = "cache/ocr_cache.db", max_entries: int = 10000,
+                 max_bytes: int = 256 * 1024 * 1024):
+        """
+        初始化SQLite缓存
+
+        Args:
+            db_path: SQLite数据库文件路径
+            max_entries: 最多保留的条目数
+            max_bytes: 缓存内容总字节数上限
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now >= row[1]:
+                self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: int):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now + ttl, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """删除过期条目，并按LRU裁剪到条目数与字节数上限内"""
+        self._conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+
+        count, total_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        expired_keys = []
+        for key, size in self._conn.execute(
+                "SELECT key, size FROM cache_entries ORDER BY last_access ASC").fetchall():
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            expired_keys.append((key,))
+            count -= 1
+            total_bytes -= size
+        self._conn.executemany("DELETE FROM cache_entries WHERE key = ?", expired_keys)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            count, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+            ).fetchone()
+        return {'backend': self.name, 'entries': count, 'bytes': total_bytes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis缓存后端，多个应用容器共享命中（容量由Redis的maxmemory策略控制）"""
+
+    name = "redis"
+
+    def __init__(self, url: str = "redis://redis:6379/0", key_prefix: str = "bank-ocr:", client=None):
+        """
+        初始化Redis缓存
+
+        Args:
+            url: Redis连接地址
+            key_prefix: 键前缀，避免与其他应用冲突
+            client: 可选，直接传入兼容redis-py接口的客户端（如测试用的进程内替身）
+        """
+        if client is None:
+            if redis is None:
+                raise ImportError("使用Redis缓存后端需要安装 redis 包")
+            client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self.client = client
+        self.key_prefix = key_prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.key_prefix + key)
+        if value is None:
+            return None
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl: int):
+        self.client.set(self.key_prefix + key, value, ex=max(int(ttl), 1))
+
+    def delete(self, key: str):
+        self.client.delete(self.key_prefix + key)
+
+    def get_stats(self) -> Dict:
+        stats = {'backend': self.name}
+        try:
+            stats['used_memory'] = self.client.info('memory').get('used_memory')
+        except Exception as e:
+            stats['error'] = str(e)
+        return stats
+
+    def close(self):
+        self.client.close()
+
+
+def create_cache_backend(cache_config: Dict) -> CacheBackend:
+    """根据配置创建缓存后端（memory / sqlite / redis）"""
+    backend = cache_config.get("backend", "sqlite")
+    max_entries = cache_config.get("max_entries", 10000)
+    max_bytes = cache_config.get("max_bytes", 268435456)
+
+    if backend == "memory":
+        return MemoryCacheBackend(max_entries=max_entries, max_bytes=max_bytes)
+    if backend == "redis":
+        return RedisCacheBackend(
+            url=cache_config.get("redis_url", "redis://redis:6379/0"),
+            key_prefix=cache_config.get("key_prefix", "bank-ocr:")
+        )
+    return SQLiteCacheBackend(
+        db_path=cache_config.get("db_path", "cache/ocr_cache.db"),
+        max_entries=max_entries,
+        max_bytes=max_bytes
+    )
+
+
+class OCRResultCache:
+    """按图像内容寻址的OCR结果缓存"""
+
+    KEY_PREFIX = "ocr:"
+
+    def __init__(self, backend: CacheBackend, ttl: int = 7 * 24 * 3600):
+        """
+        初始化结果缓存
+
+        Args:
+            backend: 实际存储的缓存后端
+            ttl: 条目有效期（秒）
+        """
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(image_bytes: bytes, settings: Dict) -> str:
+        """由图像字节与影响识别结果的配置（预处理、裁剪、分块、服务商等）生成缓存键"""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        """读取缓存的 text_data，未命中或已过期时返回 None"""
+        try:
+            value = self.backend.get(self.KEY_PREFIX + key)
+        except Exception as e:
+            print(f"读取OCR结果缓存失败: {e}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, text_data: List[Dict]):
+        """写入缓存"""
+        try:
+            self.backend.set(self.KEY_PREFIX + key, json.dumps(text_data, ensure_ascii=False), self.ttl)
+        except Exception as e:
+            print(f"写入OCR结果缓存失败: {e}")
+
+    def get_stats(self) -> Dict:
+        """获取缓存命中统计"""
+        stats = self.backend.get_stats()
+        lookups = self.hits + self.misses
+        stats.update({
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        })
+        return stats
+
+    def close(self):
+        """关闭缓存后端"""
+        self.backend.close()
+
+
+def compute_dhash(img: Image.Image, hash_size: int = 32, ignore_top_ratio: float = 0.05,
+                  tolerance: int = 4) -> int:
+    """
+    计算图像的差值哈希（dHash）
+
+    Args:
+        img: 已解码的PIL图像
+        hash_size: 哈希边长，结果为 hash_size * hash_size 位
+        ignore_top_ratio: 忽略顶部区域的比例（手机状态栏的时钟、电量等）
+        tolerance: 相邻像素灰度差超过该值才记为1，避免大片留白被压缩噪声翻转
+    """
+    width, height = img.size
+    top = int(height * ignore_top_ratio)
+    if top:
+        img = img.crop((0, top, width, height))
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    pixels = small.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] - pixels[offset + col + 1] > tolerance)
+    return value
+
+
+def compute_verification_thumbnail(img: Image.Image, width: int = 270) -> Tuple[Tuple[int, int], bytes]:
+    """
+    计算近重复复核用的灰度缩略图
+
+    dHash 对余额、账号中个别数字的变化不敏感，命中后须再比对缩略图
+
+    Args:
+        img: 已解码的PIL图像（含状态栏）
+        width: 缩略图宽度，应保证金额数字缩小后仍有数个像素高
+
+    Returns:
+        ((宽, 高), zlib压缩的灰度像素)
+    """
+    scale = min(width / img.width, 1.0)
+    size = (max(int(img.width * scale), 1), max(int(img.height * scale), 1))
+    small = img.convert('L').resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    return size, zlib.compress(small.tobytes(), 1)
+
+
+def thumbnails_match(thumbnail: Tuple[Tuple[int, int], bytes], other: Tuple[Tuple[int, int], bytes],
+                     ignore_top_ratio: float = 0.05, pixel_tolerance: int = 32) -> bool:
+    """两张缩略图除顶部状态栏外是否没有超过 pixel_tolerance 的像素差异"""
+    if thumbnail is None or other is None or thumbnail[0] != other[0]:
+        return False
+    (width, height), data = thumbnail
+    pixels = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(height, width)
+    other_pixels = np.frombuffer(zlib.decompress(other[1]), dtype=np.uint8).reshape(height, width)
+    top = int(height * ignore_top_ratio)
+    diff = np.abs(pixels[top:].astype(np.int16) - other_pixels[top:].astype(np.int16))
+    return not (diff > pixel_tolerance).any()
+
+
+class PerceptualHashIndex:
+    """近重复截图索引：按感知哈希的汉明距离召回候选，缩略图逐像素复核后复用OCR结果"""
+
+    def __init__(self, hash_bits: int = 1024, max_distance: int = 0,
+                 capacity: int = 2000, ttl: int = 24 * 3600,
+                 ignore_top_ratio: float = 0.05, pixel_tolerance: int = 32):
+        """
+        初始化近重复索引
+
+        Args:
+            hash_bits: 哈希位数
+            max_distance: 召回候选的最大汉明距离
+            capacity: 最多保留的最近截图数
+            ttl: 条目有效期（秒）
+            ignore_top_ratio: 复核时忽略的顶部区域比例（状态栏）
+            pixel_tolerance: 复核时允许的单像素灰度差（重新压缩带来的噪声）
+        """
+        self.hash_bits = hash_bits
+        self.max_distance = max_distance
+        self.capacity = capacity
+        self.ttl = ttl
+        self.ignore_top_ratio = ignore_top_ratio
+        self.pixel_tolerance = pixel_tolerance
+        self.hits = 0
+        self.misses = 0
+        # 哈希相近但缩略图复核未通过的次数
+        self.rejected = 0
+        self.distance_histogram = [0] * (max_distance + 1)
+
+        # 鸽巢原理分段：距离不超过 max_distance 的两个哈希至少有一段完全相同
+        self._band_count = max_distance + 1
+        self._band_bits = -(-hash_bits // self._band_count)
+        self._band_mask = (1 << self._band_bits) - 1
+        self._bands = [dict() for _ in range(self._band_count)]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _band_keys(self, image_hash: int) -> List[int]:
+        """拆分哈希得到各分段的值"""
+        return [(image_hash >> (band * self._band_bits)) & self._band_mask
+                for band in range(self._band_count)]
+
+    def lookup(self, image_hash: int, thumbnail: Tuple[Tuple[int, int], bytes]) -> Optional[List[Dict]]:
+        """
+        查找近重复截图的 text_data，未找到时返回 None
+
+        哈希距离只用于召回候选，缩略图除状态栏外完全一致才复用
+        """
+        now = time.time()
+        with self._lock:
+            candidates = {}
+            for band, band_key in enumerate(self._band_keys(image_hash)):
+                for candidate in self._bands[band].get(band_key, ()):
+                    distance = bin(candidate ^ image_hash).count('1')
+                    if distance <= self.max_distance:
+                        candidates[candidate] = distance
+
+            for candidate, distance in sorted(candidates.items(), key=lambda item: item[1]):
+                text_data, created_at, candidate_thumbnail = self._entries[candidate]
+                if now - created_at > self.ttl:
+                    self._remove(candidate)
+                    continue
+                if not thumbnails_match(candidate_thumbnail, thumbnail, self.ignore_top_ratio, self.pixel_tolerance):
+                    self.rejected += 1
+                    continue
+                self._entries.move_to_end(candidate)
+                self.hits += 1
+                self.distance_histogram[distance] += 1
+                return text_data
+
+            self.misses += 1
+            return None
+
+    def add(self, image_hash: int, text_data: List[Dict], thumbnail: Tuple[Tuple[int, int], bytes]):
+        """登记截图的哈希、复核缩略图及其OCR结果"""
+        with self._lock:
+            if image_hash in self._entries:
+                self._remove(image_hash)
+            self._entries[image_hash] = (text_data, time.time(), thumbnail)
+            for band, band_key in enumerate(self._band_keys(image_hash)):
+                self._bands[band].setdefault(band_key, set()).add(image_hash)
+
+            while len(self._entries) > self.capacity:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, image_hash: int):
+        """删除条目及其分段索引（调用方需持有锁）"""
+        self._entries.pop(image_hash, None)
+        for band, band_key in enumerate(self._band_keys(image_hash)):
+            bucket = self._bands[band].get(band_key)
+            if bucket:
+                bucket.discard(image_hash)
+                if not bucket:
+                    del self._bands[band][band_key]
+
+    def get_stats(self) -> Dict:
+        """获取命中统计及命中距离分布，用于调整阈值"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_distance': self.max_distance,
+                'hits': self.hits,
+                'misses': self.misses,
+                'rejected': self.rejected,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'distance_histogram': list(self.distance_histogram)
+            }
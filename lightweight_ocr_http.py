@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的HTTP连接管理
+为每个OCR服务商维护独立的长连接池，避免每张图片重复TCP+TLS握手
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import fcntl
+except ImportError:  # Windows 下无 fcntl，仅保留进程内共享
+    fcntl = None
+
+
+class ProviderSessionPool:
+    """按服务商划分的HTTP长连接池"""
+
+    def __init__(self, pool_config: Dict = None, concurrency: int = 1):
+        """
+        初始化连接池
+
+        Args:
+            pool_config: 连接池配置（对应配置文件中的 http_pool 节点）
+            concurrency: 同一服务商可能同时在途的请求数（如流水线I/O线程数），
+                pool_maxsize 不小于该值，否则并发高峰多出的连接用完即被丢弃，无法复用
+        """
+        self.pool_config = pool_config or {}
+        self.concurrency = max(int(concurrency), 1)
+        self._sessions = {}
+        self._request_counts = {}
+        self._lock = threading.Lock()
+
+    def _provider_config(self, provider: str) -> Dict:
+        """合并全局与服务商级别的连接池配置"""
+        config = {
+            'pool_connections': 10,
+            'pool_maxsize': 16,
+            'pool_block': False,
+            'keep_alive': True,
+            'max_retries': 0
+        }
+        for key, value in self.pool_config.items():
+            if key != 'providers':
+                config[key] = value
+        config.update(self.pool_config.get('providers', {}).get(provider, {}))
+        config['pool_maxsize'] = max(int(config['pool_maxsize']), self.concurrency)
+        return config
+
+    def _create_session(self, provider: str) -> requests.Session:
+        """为服务商创建带连接池的会话"""
+        config = self._provider_config(provider)
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=int(config['pool_connections']),
+            pool_maxsize=int(config['pool_maxsize']),
+            pool_block=bool(config['pool_block']),
+            max_retries=int(config['max_retries'])
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not config['keep_alive']:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def get_session(self, provider: str) -> requests.Session:
+        """获取服务商对应的会话（不存在时创建）"""
+        session = self._sessions.get(provider)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(provider)
+                if session is None:
+                    session = self._create_session(provider)
+                    self._sessions[provider] = session
+                    self._request_counts[provider] = 0
+        return session
+
+    def post(self, provider: str, url: str, **kwargs) -> requests.Response:
+        """通过服务商连接池发送POST请求"""
+        session = self.get_session(provider)
+        with self._lock:
+            self._request_counts[provider] += 1
+        return session.post(url, **kwargs)
+
+    def get_stats(self) -> Dict:
+        """获取各服务商的连接复用统计"""
+        stats = {}
+        with self._lock:
+            sessions = dict(self._sessions)
+            request_counts = dict(self._request_counts)
+
+        for provider, session in sessions.items():
+            new_connections = 0
+            pooled_requests = 0
+            hosts = []
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    try:
+                        pool = pools[key]
+                    except KeyError:
+                        continue
+                    new_connections += pool.num_connections
+                    pooled_requests += pool.num_requests
+                    hosts.append(f"{pool.scheme}://{pool.host}:{pool.port}")
+
+            stats[provider] = {
+                'requests': request_counts.get(provider, 0),
+                'new_connections': new_connections,
+                'reused_connections': max(pooled_requests - new_connections, 0),
+                'reuse_ratio': (pooled_requests - new_connections) / pooled_requests if pooled_requests else 0.0,
+                'hosts': hosts
+            }
+        return stats
+
+    def close(self):
+        """关闭所有会话并释放连接"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._request_counts.clear()
+
+
+class BaiduTokenManager:
+    """百度OAuth access_token 管理器（线程/进程间共享）"""
+
+    TOKEN_URL = "https://aip.baidubce.com/oauth/2.0/token"
+    # 百度返回的鉴权类错误码：token无效 / token过期
+    AUTH_ERROR_CODES = {110, 111}
+
+    def __init__(self, http_pool: ProviderSessionPool, api_key: str, secret_key: str,
+                 cache_path: str = "config/baidu_token.json", refresh_margin: int = 86400,
+                 store=None):
+        """
+        初始化token管理器
+
+        Args:
+            http_pool: 百度请求复用的连接池
+            api_key: 百度API Key
+            secret_key: 百度Secret Key
+            cache_path: 磁盘token缓存文件路径，多进程共享
+            refresh_margin: 距离过期多少秒时开始后台提前刷新
+            store: 可选，共享缓存后端（如Redis），传入时替代磁盘文件在多副本间共享token
+        """
+        self.http_pool = http_pool
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.cache_path = cache_path
+        self.refresh_margin = refresh_margin
+        self.store = store
+        self.cache_key = hashlib.sha256(f"{api_key}:{secret_key}".encode('utf-8')).hexdigest()[:16]
+
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_flag_lock = threading.Lock()
+        self._refreshing = False
+
+    def get_token(self) -> Optional[str]:
+        """获取可用的access_token，临近过期时后台提前刷新"""
+        now = time.time()
+        if self._token and now < self._expires_at:
+            if now >= self._expires_at - self.refresh_margin:
+                self._start_background_refresh()
+            return self._token
+
+        with self._lock:
+            if self._token and time.time() < self._expires_at:
+                return self._token
+            if self._load_from_disk():
+                return self._token
+            return self._refresh(stale_token=None)
+
+    def refresh_after_auth_error(self, stale_token: str) -> Optional[str]:
+        """调用因鉴权失败时强制刷新token（其他线程已刷新则直接复用）"""
+        with self._lock:
+            if self._token and self._token != stale_token and time.time() < self._expires_at:
+                return self._token
+            return self._refresh(stale_token=stale_token)
+
+    def is_auth_error(self, result: Dict) -> bool:
+        """判断百度接口返回是否为token鉴权错误"""
+        return result.get("error_code") in self.AUTH_ERROR_CODES
+
+    def _start_background_refresh(self):
+        """在后台线程中提前刷新token"""
+        with self._refresh_flag_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def _run():
+            try:
+                with self._lock:
+                    if time.time() < self._expires_at - self.refresh_margin:
+                        return
+                    if self._load_from_disk() and time.time() < self._expires_at - self.refresh_margin:
+                        return
+                    self._refresh(stale_token=None)
+            except Exception as e:
+                print(f"百度OCR后台刷新token失败: {e}")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=_run, name="baidu-token-refresh", daemon=True).start()
+
+    def _refresh(self, stale_token: Optional[str]) -> Optional[str]:
+        """向百度获取新token并写入磁盘（调用方需持有 self._lock）"""
+        with self._file_lock():
+            # 其他进程可能已经刷新过，优先复用
+            entry = self._read_disk_entry()
+            if entry and entry["access_token"] != stale_token \
+                    and time.time() < entry["expires_at"] - self.refresh_margin:
+                self._token = entry["access_token"]
+                self._expires_at = entry["expires_at"]
+                return self._token
+
+            token_params = {
+                "grant_type": "client_credentials",
+                "client_id": self.api_key,
+                "client_secret": self.secret_key
+            }
+            response = self.http_pool.post('baidu', self.TOKEN_URL, params=token_params, timeout=10)
+            if response.status_code != 200:
+                print("百度OCR获取token失败")
+                return None
+
+            result = response.json()
+            access_token = result.get("access_token")
+            if not access_token:
+                print("百度OCR token无效")
+                return None
+
+            self._token = access_token
+            self._expires_at = time.time() + int(result.get("expires_in", 2592000))
+            self._write_disk_entry()
+            return self._token
+
+    def _load_from_disk(self) -> bool:
+        """从磁盘缓存加载未过期的token"""
+        entry = self._read_disk_entry()
+        if entry and time.time() < entry["expires_at"]:
+            self._token = entry["access_token"]
+            self._expires_at = entry["expires_at"]
+            return True
+        return False
+
+    def _read_disk_entry(self) -> Optional[Dict]:
+        """读取磁盘缓存（或共享缓存后端）中当前凭据对应的条目"""
+        if self.store is not None:
+            try:
+                value = self.store.get(f"baidu_token:{self.cache_key}")
+                return json.loads(value) if value else None
+            except Exception as e:
+                print(f"读取百度token缓存失败: {e}")
+                return None
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f).get(self.cache_key)
+            if entry and entry.get("access_token"):
+                return entry
+        except (OSError, ValueError) as e:
+            print(f"读取百度token缓存失败: {e}")
+        return None
+
+    def _write_disk_entry(self):
+        """原子写入磁盘缓存（或共享缓存后端）"""
+        if self.store is not None:
+            try:
+                entry = {"access_token": self._token, "expires_at": self._expires_at}
+                self.store.set(f"baidu_token:{self.cache_key}", json.dumps(entry),
+                               self._expires_at - time.time())
+            except Exception as e:
+                print(f"写入百度token缓存失败: {e}")
+            return
+        if not self.cache_path:
+            return
+        try:
+            data = {}
+            if os.path.exists(self.cache_path):
+                try:
+                    with open(self.cache_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                except ValueError:
+                    data = {}
+            data[self.cache_key] = {
+                "access_token": self._token,
+                "expires_at": self._expires_at
+            }
+            directory = os.path.dirname(self.cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"写入百度token缓存失败: {e}")
+
+    def _file_lock(self):
+        """跨进程文件锁，避免多个worker同时刷新"""
+        use_file = self.store is None and self.cache_path and fcntl
+        return _FileLock(f"{self.cache_path}.lock" if use_file else None)
+
+
+class _FileLock:
+    """基于 fcntl.flock 的简单文件锁"""
+
+    def __init__(self, lock_path: Optional[str]):
+        self.lock_path = lock_path
+        self._file = None
+
+    def __enter__(self):
+        if self.lock_path:
+            directory = os.path.dirname(self.lock_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.lock_path, 'a')
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._file:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        return False
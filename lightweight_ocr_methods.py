@@ -7,40 +7,370 @@
 
 import os
 import re
+import math
 import json
+import time
+import threading
+from concurrent.futures import wait, FIRST_COMPLETED
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 import pandas as pd
 
+from lightweight_image_utils import ImagePayload
+from lightweight_result_store import ResultStore, create_result_store
+from lightweight_field_scanner import FieldScanner
+from lightweight_company_index import CompanyNameIndex
+
 # 这些方法应该添加到 LightweightOCRProcessor 类中
 
+# 判定一次识别结果"完整"所需的字段
+REQUIRED_FIELDS = ('bank_name', 'company_name', 'account_number', 'balance')
+
 def _extract_text_from_image(self, image_path: str) -> List[Dict]:
     """从图像中提取文本（使用API调用）"""
     try:
-        image_data = self._preprocess_image(image_path)
-        if not image_data:
-            return []
-        
-        all_text_data = []
+        cache_key = self._ocr_cache_key(image_path)
+        cached_text_data = self._lookup_cached_text(image_path, cache_key)
+        if cached_text_data is not None:
+            return cached_text_data
         
-        for provider, api_func in self.api_providers.items():
-            if self.config["ocr_apis"][provider]["enabled"]:
-                try:
-                    text_data = api_func(image_data)
-                    all_text_data.extend(text_data)
-                except Exception as e:
-                    print(f"{provider} API调用失败: {e}")
-                    continue
+        image_data = self._preprocess_image(image_path)
+        return self._recognize_payload(image_path, image_data, cache_key)
         
-        if not all_text_data:
+    except Exception as e:
+        print(f"文本提取失败: {e}")
+        return []
+
+def _lookup_cached_text(self, image_path: str, cache_key: Optional[str]) -> Optional[List[Dict]]:
+    """查询结果缓存，命中时返回文本数据"""
+    if not cache_key:
+        return None
+    cached_text_data = self.ocr_cache.get(cache_key)
+    if cached_text_data is not None:
+        print(f"OCR结果缓存命中: {image_path}")
+    return cached_text_data
+
+def _recognize_payload(self, image_path: str, image_data: Optional[ImagePayload],
+                       cache_key: Optional[str]) -> List[Dict]:
+    """对预处理后的图像调用OCR服务商，并写入缓存"""
+    if not image_data:
+        return []
+    
+    image_hash = image_data.dhash
+    near_duplicate = image_hash is not None and image_data.thumbnail is not None \
+        and self.near_duplicate_index is not None
+    if near_duplicate:
+        # 近重复命中只复用结果，不写入按内容寻址的结果缓存
+        near_text_data = self.near_duplicate_index.lookup(image_hash, image_data.thumbnail)
+        if near_text_data is not None:
+            print(f"命中近重复截图，复用OCR结果: {image_path}")
+            return near_text_data
+    
+    dispatch_config = self.config.get("dispatch", {})
+    strategy = dispatch_config.get("strategy", "sequential")
+    
+    if image_data.tiles:
+        all_text_data, complete = self._dispatch_tiles(image_data, dispatch_config)
+    elif strategy == "parallel":
+        all_text_data, complete = self._dispatch_parallel(image_data, dispatch_config)
+    elif strategy == "race":
+        all_text_data, complete = self._dispatch_race(image_data, dispatch_config)
+    elif strategy == "cascade":
+        all_text_data, complete = self._dispatch_cascade(image_data, dispatch_config)
+    else:
+        all_text_data, complete = self._dispatch_sequential(image_data)
+    
+    if not all_text_data:
+        if not self._enabled_providers():
             print("没有启用的OCR API，使用模拟数据")
             return self._simulate_ocr_result(image_path)
+        # 服务商均失败或超时：返回空结果，图像按失败处理，不能用模拟数据冒充识别结果
+        print(f"所有OCR服务商均未返回文字: {image_path}")
+        return []
+    
+    # 有服务商/分块失败、超时或未返回文字时结果可能残缺，不写入缓存，下次重新识别
+    if cache_key and complete:
+        self.ocr_cache.set(cache_key, all_text_data)
+    elif cache_key:
+        print(f"OCR结果不完整，不写入缓存: {image_path}")
+    if near_duplicate and complete:
+        self.near_duplicate_index.add(image_hash, all_text_data, image_data.thumbnail)
+    
+    return all_text_data
+
+def _ocr_cache_key(self, image_path: str) -> Optional[str]:
+    """计算图像的结果缓存键（图像字节 + 影响识别结果的配置），未启用缓存时返回 None"""
+    if self.ocr_cache is None:
+        return None
+    try:
+        with open(image_path, 'rb') as f:
+            image_bytes = f.read()
+        return self.ocr_cache.make_key(image_bytes, self._ocr_cache_settings())
+    except OSError as e:
+        print(f"计算缓存键失败: {e}")
+        return None
+
+def _ocr_cache_settings(self) -> Dict:
+    """
+    影响OCR输出的配置：预处理、裁剪、分块、各服务商编码、启用的服务商及其接口参数、调度方式
+
+    服务商参数只排除凭据与token缓存设置（不影响识别结果）；image_deadline 不计入，
+    超时的结果本来就不写入缓存
+    """
+    dispatch_config = self.config.get("dispatch", {})
+    return {
+        'image_preprocessing': self.config["image_preprocessing"],
+        'text_crop': self.config.get("text_crop", {}),
+        'tiling': self.config.get("tiling", {}),
+        'provider_payloads': self.config.get("provider_payloads", {}),
+        'providers': {
+            provider: {
+                key: value for key, value in self.config["ocr_apis"][provider].items()
+                if key != "enabled" and not any(word in key for word in ("key", "secret", "token"))
+            }
+            for provider in self._enabled_providers()
+        },
+        'strategy': dispatch_config.get("strategy", "sequential"),
+        # cascade/race 由优先级（及对冲延迟）决定采用哪个服务商的结果
+        'priority': dispatch_config.get("priority", []),
+        'hedge_delay': dispatch_config.get("hedge_delay", 0.5)
+    }
+
+def _enabled_providers(self) -> List[str]:
+    """获取已启用的OCR服务商列表"""
+    return [
+        provider for provider in self.api_providers
+        if self.config["ocr_apis"].get(provider, {}).get("enabled")
+    ]
+
+def _prioritized_providers(self, dispatch_config: Dict) -> List[str]:
+    """按配置的优先级（通常即成本从低到高）排列已启用的服务商"""
+    enabled = self._enabled_providers()
+    priority = [provider for provider in dispatch_config.get("priority", []) if provider in enabled]
+    return priority + [provider for provider in enabled if provider not in priority]
+
+def _dispatch_sequential(self, image_data: ImagePayload) -> Tuple[List[Dict], bool]:
+    """
+    依次调用所有启用的服务商
+    
+    各 _dispatch_* 方法均返回 (文本数据, 是否完整)；服务商失败时只返回空列表，
+    因此任一服务商异常、超时或未返回文字都视为不完整
+    """
+    all_text_data = []
+    complete = True
+    for provider in self._enabled_providers():
+        try:
+            text_data = self.api_providers[provider](image_data)
+        except Exception as e:
+            print(f"{provider} API调用失败: {e}")
+            complete = False
+            continue
+        complete = complete and bool(text_data)
+        all_text_data.extend(text_data)
+    return all_text_data, complete
+
+def _dispatch_parallel(self, image_data: ImagePayload, dispatch_config: Dict) -> Tuple[List[Dict], bool]:
+    """并发调用所有启用的服务商，超过单图截止时间的结果直接丢弃"""
+    providers = self._enabled_providers()
+    if not providers:
+        return [], False
+    
+    deadline = dispatch_config.get("image_deadline", 20)
+    futures = {
+        self.dispatch_executor.submit(self.api_providers[provider], image_data): provider
+        for provider in providers
+    }
+    done, not_done = wait(futures, timeout=deadline)
+    
+    for future in not_done:
+        future.cancel()
+        print(f"{futures[future]} API超过截止时间 {deadline} 秒，结果已丢弃")
+    
+    # 按服务商配置顺序合并，保证结果稳定
+    results = {}
+    for future in done:
+        provider = futures[future]
+        try:
+            results[provider] = future.result()
+        except Exception as e:
+            print(f"{provider} API调用失败: {e}")
+    
+    all_text_data = []
+    for provider in providers:
+        all_text_data.extend(results.get(provider, []))
+    return all_text_data, all(results.get(provider) for provider in providers)
+
+def _is_complete_extraction(self, text_data: List[Dict]) -> bool:
+    """判断文本能否提取出全部关键字段"""
+    if not text_data:
+        return False
+    extracted_info = self._extract_information_with_patterns(text_data)
+    return all(extracted_info.get(field) is not None for field in REQUIRED_FIELDS)
+
+def _dispatch_race(self, image_data: ImagePayload, dispatch_config: Dict) -> Tuple[List[Dict], bool]:
+    """竞速调用服务商：按对冲延迟错峰发出请求，首个完整结果胜出"""
+    providers = self._prioritized_providers(dispatch_config)
+    if not providers:
+        return [], False
+    
+    hedge_delay = dispatch_config.get("hedge_delay", 0.5)
+    deadline_at = time.monotonic() + dispatch_config.get("image_deadline", 20)
+    pending = list(providers)
+    running = {}
+    results = {}
+    next_launch_at = time.monotonic()
+    
+    while pending or running:
+        now = time.monotonic()
+        if now >= deadline_at:
+            break
         
-        return all_text_data
+        if pending and now >= next_launch_at:
+            provider = pending.pop(0)
+            running[self.dispatch_executor.submit(self.api_providers[provider], image_data)] = provider
+            next_launch_at = now + hedge_delay
+            continue
         
-    except Exception as e:
-        print(f"文本提取失败: {e}")
-        return []
+        wait_until = min(next_launch_at, deadline_at) if pending else deadline_at
+        done, _ = wait(list(running), timeout=max(wait_until - now, 0), return_when=FIRST_COMPLETED)
+        
+        for future in done:
+            provider = running.pop(future)
+            try:
+                text_data = future.result()
+            except Exception as e:
+                print(f"{provider} API调用失败: {e}")
+                text_data = []
+            results[provider] = text_data
+            
+            if self._is_complete_extraction(text_data):
+                for other in running:
+                    other.cancel()
+                print(f"{provider} API率先返回完整结果，取消其余 {len(running)} 个请求")
+                return text_data, True
+            
+            # 失败或结果不完整时立即对冲下一个服务商
+            next_launch_at = time.monotonic()
+    
+    for future, provider in running.items():
+        future.cancel()
+        print(f"{provider} API超过截止时间，结果已丢弃")
+    
+    all_text_data = []
+    for provider in providers:
+        all_text_data.extend(results.get(provider, []))
+    return all_text_data, all(results.get(provider) for provider in providers)
+
+def _dispatch_cascade(self, image_data: ImagePayload, dispatch_config: Dict) -> Tuple[List[Dict], bool]:
+    """按优先级逐个调用服务商，关键字段齐全且置信度达标即停止"""
+    all_text_data = []
+    complete = True
+    for provider in self._prioritized_providers(dispatch_config):
+        try:
+            text_data = self.api_providers[provider](image_data)
+        except Exception as e:
+            print(f"{provider} API调用失败: {e}")
+            complete = False
+            continue
+        if not text_data:
+            complete = False
+            continue
+        
+        all_text_data.extend(text_data)
+        extracted_info = self._extract_information_with_patterns(all_text_data)
+        threshold = self.config["ocr_apis"][provider].get("confidence_threshold", 0.8)
+        if all(extracted_info.get(field) is not None for field in REQUIRED_FIELDS) \
+                and extracted_info.get('extraction_confidence', 0.0) >= threshold:
+            print(f"{provider} API已提取全部关键字段，跳过其余服务商")
+            break
+    
+    return all_text_data, complete
+
+def _dispatch_tiles(self, image_data: ImagePayload, dispatch_config: Dict) -> Tuple[List[Dict], bool]:
+    """将所有分块并发发送给所有启用的服务商，按阅读顺序合并并去除重叠区的重复行"""
+    providers = self._enabled_providers()
+    if not providers:
+        return [], False
+    
+    deadline = dispatch_config.get("image_deadline", 20)
+    futures = {}
+    for index, tile in enumerate(image_data.tiles):
+        for provider in providers:
+            futures[self.dispatch_executor.submit(self.api_providers[provider], tile)] = (index, provider)
+    done, not_done = wait(futures, timeout=deadline)
+    
+    for future in not_done:
+        future.cancel()
+        index, provider = futures[future]
+        print(f"{provider} API分块 {index + 1} 超过截止时间 {deadline} 秒，结果已丢弃")
+    
+    tile_results = {}
+    for future in done:
+        index, provider = futures[future]
+        try:
+            tile_results[(index, provider)] = future.result()
+        except Exception as e:
+            print(f"{provider} API分块 {index + 1} 调用失败: {e}")
+    
+    if not image_data.tile_overlap:
+        # 文字区域裁剪出的分块互不重叠，图标、logo 等没有文字的分块直接跳过；
+        # 有分块超时或失败时结果不写入缓存
+        complete = len(tile_results) == len(futures) and all(
+            any(tile_results[(index, provider)] for index in range(len(image_data.tiles)))
+            for provider in providers
+        )
+        all_text_data = []
+        for provider in providers:
+            for index in range(len(image_data.tiles)):
+                all_text_data.extend(tile_results.get((index, provider), []))
+        return all_text_data, complete
+    
+    # 超长截图分块：某个分块所有服务商都没有结果时，拼接出的流水会缺一段，整张图按失败处理
+    missing = [index + 1 for index in range(len(image_data.tiles))
+               if not any(tile_results.get((index, provider)) for provider in providers)]
+    if missing:
+        raise RuntimeError(f"分块 {missing} 未识别到文字（超时或调用失败），结果不完整")
+    
+    all_text_data = []
+    for provider in providers:
+        provider_lines = []
+        for index in range(len(image_data.tiles)):
+            tile_lines = tile_results.get((index, provider), [])
+            if image_data.tile_overlap[index] > 0:
+                tile_lines = self._drop_overlap_duplicates(provider_lines, tile_lines,
+                                                           image_data.tile_overlap[index])
+            provider_lines.extend(tile_lines)
+        all_text_data.extend(provider_lines)
+    return all_text_data, all(tile_results.get(key) for key in futures.values())
+
+def _drop_overlap_duplicates(self, previous_lines: List[Dict], tile_lines: List[Dict],
+                             overlap_ratio: float) -> List[Dict]:
+    """
+    去掉分块开头与上一分块末尾重复识别的行（来自重叠区域）
+    
+    Args:
+        overlap_ratio: 重叠区域占本分块高度的比例，用于估计重叠区最多包含的行数，
+            避免把流水中内容相同的真实行（如多条“转账 -100.00”）当作重复去掉
+    """
+    window = self.config.get("tiling", {}).get("dedup_window", 30)
+    # 按行数比例估算重叠区行数，多留一行给跨越边界的行
+    window = min(window, math.ceil(len(tile_lines) * overlap_ratio) + 1)
+    tail = [re.sub(r'\s+', '', item['text']) for item in previous_lines[-window:]]
+    head = [re.sub(r'\s+', '', item['text']) for item in tile_lines[:window]]
+    if not tail or not head:
+        return tile_lines
+    
+    # 优先找上一分块末尾与本分块开头完全一致的最长行序列
+    for size in range(min(len(tail), len(head)), 0, -1):
+        if tail[-size:] == head[:size]:
+            return tile_lines[size:]
+    
+    # 行切分不一致时，跳过开头连续出现在上一分块末尾的行
+    tail_set = set(tail)
+    skip = 0
+    while skip < len(head) and head[skip] in tail_set:
+        skip += 1
+    return tile_lines[skip:]
 
 def _simulate_ocr_result(self, image_path: str) -> List[Dict]:
     """模拟OCR结果（用于演示）"""
@@ -68,8 +398,8 @@ def _simulate_ocr_result(self, image_path: str) -> List[Dict]:
             {'text': '余额: 8888.88', 'confidence': 0.88, 'engine': 'simulated'}
         ]
 
-def _extract_information_with_patterns(self, text_data: List[Dict]) -> Dict:
-    """使用模式匹配提取信息"""
+def _extract_information_with_patterns(self, text_data: List[Dict], bank_data=None) -> Dict:
+    """使用模式匹配提取信息（bank_data 为本次处理持有的银行库快照，默认取当前代）"""
     try:
         extracted_info = {
             'bank_name': None,
@@ -79,42 +409,14 @@ def _extract_information_with_patterns(self, text_data: List[Dict]) -> Dict:
             'extraction_confidence': 0.0
         }
         
-        patterns = self.config["extraction_rules"]
         all_text = " ".join([item['text'] for item in text_data])
+        extracted_info.update(self.field_scanner.scan(all_text))
         
-        # 提取银行名称
-        for pattern in patterns["bank_name_patterns"]:
-            matches = re.findall(pattern, all_text)
-            if matches:
-                extracted_info['bank_name'] = matches[0]
-                break
-        
-        # 提取公司名称
-        for pattern in patterns["company_patterns"]:
-            matches = re.findall(pattern, all_text)
-            if matches:
-                extracted_info['company_name'] = matches[0]
-                break
-        
-        # 提取账号
-        for pattern in patterns["account_patterns"]:
-            matches = re.findall(pattern, all_text)
-            if matches:
-                account = re.sub(r'[\s-]', '', str(matches[0]))
-                if len(account) >= 10:
-                    extracted_info['account_number'] = account
-                    break
-        
-        # 提取余额
-        for pattern in patterns["balance_patterns"]:
-            matches = re.findall(pattern, all_text)
-            if matches:
-                try:
-                    balance_str = re.sub(r'[¥￥,]', '', str(matches[0]))
-                    extracted_info['balance'] = float(balance_str)
-                    break
-                except ValueError:
-                    continue
+        # 优先使用银行名称词典（最长匹配，返回规范名称），未命中时保留正则结果
+        if self.config.get("bank_matcher", {}).get("enabled", True):
+            bank_match = (bank_data or self.bank_data).bank_matcher.find_longest(all_text)
+            if bank_match:
+                extracted_info['bank_name'] = bank_match[1]
         
         # 计算提取置信度
         confidence_scores = [item['confidence'] for item in text_data]
@@ -127,36 +429,52 @@ def _extract_information_with_patterns(self, text_data: List[Dict]) -> Dict:
         print(f"信息提取失败: {e}")
         return {}
 
-def _validate_with_database(self, extracted_info: Dict) -> Dict:
-    """与数据库验证"""
+def _validate_with_database(self, extracted_info: Dict, bank_data=None) -> Dict:
+    """与数据库验证（bank_data 为本次处理持有的银行库快照，默认取当前代）"""
     try:
-        if self.bank_database.empty:
+        bank_data = bank_data or self.bank_data
+        if bank_data.bank_database.empty:
             extracted_info['validation_status'] = 'NO_DATABASE'
             return extracted_info
         
+        company_config = self.config.get("company_match", {})
+        company_name = extracted_info.get('company_name')
+        
         if extracted_info.get('account_number'):
-            matches = self.bank_database[
-                self.bank_database.astype(str).apply(
-                    lambda x: x.str.contains(str(extracted_info['account_number']), na=False)
-                ).any(axis=1)
-            ]
-            
-            if not matches.empty:
-                match = matches.iloc[0]
-                # 尝试不同的列名
-                for col in match.index:
-                    if '公司' in str(col) or 'company' in str(col).lower():
-                        extracted_info['company_name_db'] = str(match[col])
-                    elif '银行' in str(col) or 'bank' in str(col).lower():
-                        extracted_info['bank_name_db'] = str(match[col])
-                    elif '账号' in str(col) or 'account' in str(col).lower():
-                        extracted_info['account_number_db'] = str(match[col])
-                extracted_info['validation_status'] = 'MATCHED'
-            else:
-                extracted_info['validation_status'] = 'NOT_FOUND'
+            record = bank_data.bank_index.lookup(extracted_info['account_number'], company_name)
+            if record is not None:
+                extracted_info.update(record)
+                # 掩码/片段账号对应多行时提示人工核对
+                if record['account_match_type'] != 'exact' and record['account_candidates'] > 1:
+                    extracted_info['validation_status'] = 'AMBIGUOUS'
+                else:
+                    extracted_info['validation_status'] = 'MATCHED'
+                # 核对账号命中行的公司名称
+                if company_name:
+                    extracted_info['company_match_score'] = CompanyNameIndex.similarity(
+                        company_name, record.get('company_name_db'))
+                return extracted_info
+            extracted_info['validation_status'] = 'NOT_FOUND'
         else:
             extracted_info['validation_status'] = 'NO_ACCOUNT'
         
+        # 账号缺失或未命中（如OCR识别错一位）时按公司名称相似度定位
+        if company_name and company_config.get("enabled", True):
+            record = bank_data.bank_index.lookup_company(
+                company_name, company_config.get("top_k", 5), company_config.get("min_score", 0.5),
+                extracted_info.get('account_number'))
+            if record is not None:
+                extracted_info.update(record)
+                # 该公司有多个账户且无法由账号确定，或次优候选与最优候选相似度过于接近时提示人工核对
+                candidates = record['company_candidates']
+                if record['account_candidates'] > 1:
+                    extracted_info['validation_status'] = 'AMBIGUOUS'
+                elif len(candidates) > 1 and \
+                        candidates[0]['score'] - candidates[1]['score'] < company_config.get("min_margin", 0.05):
+                    extracted_info['validation_status'] = 'AMBIGUOUS'
+                else:
+                    extracted_info['validation_status'] = 'COMPANY_MATCHED'
+        
         return extracted_info
         
     except Exception as e:
@@ -164,14 +482,67 @@ def _validate_with_database(self, extracted_info: Dict) -> Dict:
         extracted_info['validation_status'] = 'ERROR'
         return extracted_info
 
-def process_image(self, image_path: str) -> Dict:
-    """处理单张图像"""
+def _validate_batch(self, results: List[Dict], bank_data=None):
+    """
+    整批与数据库比对：精确账号经一次向量化 merge 解析后回写到各条结果，
+    掩码/片段账号、未命中及无账号的条目逐条走索引与公司名称回退
+    """
+    bank_data = bank_data or self.bank_data
+    pending = [result for result in results if result and result.get('status') == 'SUCCESS']
+    if not pending:
+        return
+    
+    resolved = set()
+    try:
+        if not bank_data.bank_database.empty and bank_data.bank_index.account_columns:
+            matches = bank_data.bank_index.lookup_exact_batch(
+                [info.get('account_number') for info in pending],
+                [info.get('company_name') for info in pending]
+            )
+            positions = matches.pop('position').tolist()
+            # 按列取出再逐条回写，避免 DataFrame 逐行装箱
+            columns = list(matches.columns)
+            for position, values in zip(positions, zip(*(matches[col].tolist() for col in columns))):
+                info = pending[position]
+                info.update(zip(columns, values))
+                info['validation_status'] = 'MATCHED'
+                company_name = info.get('company_name')
+                if company_name:
+                    company_name_db = info.get('company_name_db')
+                    info['company_match_score'] = 1.0 if company_name == company_name_db else \
+                        CompanyNameIndex.similarity(company_name, company_name_db)
+                resolved.add(position)
+    except Exception as e:
+        print(f"批量数据库验证失败，改为逐条验证: {e}")
+        resolved = set()
+    
+    for position, info in enumerate(pending):
+        if position not in resolved:
+            self._validate_with_database(info, bank_data)
+
+def process_image(self, image_path: str, bank_data=None, validate: bool = True) -> Dict:
+    """
+    处理单张图像
+    
+    Args:
+        image_path: 图像路径
+        bank_data: 可选，使用的银行库快照（批量处理时整批共用一代）
+        validate: False 时只抽取字段，留待整批比对
+    """
     start_time = datetime.now()
     print(f"开始处理图像: {image_path}")
     
     try:
         text_data = self._extract_text_from_image(image_path)
+        return self._build_result(image_path, text_data, start_time, bank_data, validate)
         
+    except Exception as e:
+        return self._failed_result(image_path, f"图像处理失败: {str(e)}", start_time)
+
+def _build_result(self, image_path: str, text_data: List[Dict], start_time: datetime,
+                  bank_data=None, validate: bool = True) -> Dict:
+    """根据识别出的文本抽取字段并与数据库比对（validate 为 False 时留待整批比对），生成单张图像的结果"""
+    try:
         if not text_data:
             return {
                 'image_path': image_path,
@@ -180,13 +551,18 @@ def process_image(self, image_path: str) -> Dict:
                 'processing_time': (datetime.now() - start_time).total_seconds()
             }
         
-        extracted_info = self._extract_information_with_patterns(text_data)
+        # 同一张图像的抽取与比对使用同一代银行库，不受处理期间热加载影响
+        bank_data = bank_data or self.bank_data
+        extracted_info = self._extract_information_with_patterns(text_data, bank_data)
         extracted_info['image_path'] = image_path
         extracted_info['extraction_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         extracted_info['status'] = 'SUCCESS'
         extracted_info['text_data'] = text_data
         
-        validated_info = self._validate_with_database(extracted_info)
+        if validate:
+            validated_info = self._validate_with_database(extracted_info, bank_data)
+        else:
+            validated_info = extracted_info
         processing_time = (datetime.now() - start_time).total_seconds()
         validated_info['processing_time'] = processing_time
         
@@ -194,26 +570,119 @@ def process_image(self, image_path: str) -> Dict:
         return validated_info
         
     except Exception as e:
-        error_msg = f"图像处理失败: {str(e)}"
-        print(error_msg)
-        
-        return {
-            'image_path': image_path,
-            'status': 'FAILED',
-            'error': error_msg,
-            'processing_time': (datetime.now() - start_time).total_seconds()
-        }
+        return self._failed_result(image_path, f"图像处理失败: {str(e)}", start_time)
 
-def process_multiple_images(self, image_paths: List[str]) -> List[Dict]:
-    """批量处理图像"""
-    results = []
-    for image_path in image_paths:
-        result = self.process_image(image_path)
-        results.append(result)
+def _failed_result(self, image_path: str, error_msg: str, start_time: datetime) -> Dict:
+    """生成处理失败的结果"""
+    print(error_msg)
+    return {
+        'image_path': image_path,
+        'status': 'FAILED',
+        'error': error_msg,
+        'processing_time': (datetime.now() - start_time).total_seconds()
+    }
+
+def process_multiple_images(self, image_paths: List[str],
+                            keep_results: bool = True) -> Union[List[Dict], ResultStore]:
+    """
+    批量处理图像（超大批量时结果落盘，返回可迭代的结果存储）
     
-    self.results = results
+    Args:
+        image_paths: 图像路径列表
+        keep_results: 是否同时保存到 self.results；多线程共享处理器时应传 False，
+            并把返回的结果显式传给导出方法
+    
+    Returns:
+        结果列表；落盘时为 ResultStore（可迭代、支持 len），用完后应调用其 delete()
+    """
+    # 整批使用同一代银行库；批量较大时先只抽取字段，再整批一次性比对
+    bank_data = self.bank_data
+    batch_config = self.config.get("batch_validation", {})
+    batched = batch_config.get("enabled", False) and len(image_paths) >= batch_config.get("min_batch", 200)
+    
+    spill_config = self.config.get("result_spill", {})
+    if spill_config.get("enabled", False) and len(image_paths) >= spill_config.get("min_batch", 1000):
+        results = self._process_images_to_store(image_paths, spill_config, bank_data, batched)
+    else:
+        results = [None] * len(image_paths)
+        for index, result in self._iter_indexed_results(image_paths, bank_data=bank_data, validate=not batched):
+            results[index] = result
+        if batched:
+            self._validate_batch(results, bank_data)
+    
+    if keep_results:
+        self.results = results
     return results
 
+def _process_images_to_store(self, image_paths: List[str], spill_config: Dict,
+                             bank_data=None, batched: bool = False) -> ResultStore:
+    """逐条将结果写入磁盘存储，内存中只保留统计摘要（整批比对时按块比对后写入）"""
+    store = create_result_store(spill_config)
+    print(f"批量结果写入磁盘: {store.path}")
+    chunk_size = max(int(self.config.get("batch_validation", {}).get("chunk_size", 5000)), 1)
+    chunk = []
+    
+    def flush():
+        self._validate_batch([result for _, result in chunk], bank_data)
+        for index, result in chunk:
+            store.append(index, result)
+        chunk.clear()
+    
+    try:
+        for index, result in self._iter_indexed_results(image_paths, bank_data=bank_data, validate=not batched):
+            if not batched:
+                store.append(index, result)
+                continue
+            chunk.append((index, result))
+            if len(chunk) >= chunk_size:
+                flush()
+        if chunk:
+            flush()
+    finally:
+        store.close()
+    print(f"批量处理完成: {store.summary}")
+    return store
+
+def iter_process_images(self, image_paths: List[str], ordered: bool = False,
+                        cancel_event: threading.Event = None) -> Iterator[Dict]:
+    """
+    批量处理图像，每完成一张即产出其结果
+    
+    Args:
+        image_paths: 图像路径列表
+        ordered: True 时按输入顺序产出（先完成的结果暂存等待前序图像），False 时按完成顺序产出
+        cancel_event: 可选，置位后不再处理剩余图像；消费方提前停止迭代同样会取消剩余任务
+    """
+    results = self._iter_indexed_results(image_paths, cancel_event)
+    try:
+        if not ordered:
+            for _, result in results:
+                yield result
+            return
+        
+        pending = {}
+        next_index = 0
+        for index, result in results:
+            pending[index] = result
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+    finally:
+        results.close()
+
+def _iter_indexed_results(self, image_paths: List[str], cancel_event: threading.Event = None,
+                          bank_data=None, validate: bool = True) -> Iterator[Tuple[int, Dict]]:
+    """按完成顺序产出 (输入序号, 结果)"""
+    pipeline_config = self.config.get("pipeline", {})
+    if pipeline_config.get("enabled", False) and len(image_paths) >= pipeline_config.get("min_batch", 2):
+        yield from self._get_batch_pipeline().run(image_paths, cancel_event, bank_data, validate)
+        return
+    
+    for index, image_path in enumerate(image_paths):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        yield index, self.process_image(image_path, bank_data, validate)
+
 def update_api_config(self, provider: str, config: Dict) -> bool:
     """更新API配置"""
     try:
@@ -233,6 +702,40 @@ def update_api_config(self, provider: str, config: Dict) -> bool:
         print(f"更新API配置失败: {e}")
         return False
 
+def reload_bank_database(self) -> bool:
+    """重新构建银行库、索引与银行名称匹配器，完成后原子切换到新一代"""
+    try:
+        with self._bank_reload_lock:
+            generation = self._build_bank_generation()
+            if generation is None:
+                return False
+            self._swap_bank_generation(generation)
+        return True
+    except Exception as e:
+        print(f"重新加载银行库失败: {e}")
+        return False
+
+def update_extraction_rules(self, rules: Dict) -> bool:
+    """更新字段抽取规则并重新编译"""
+    try:
+        extraction_rules = dict(self.config["extraction_rules"])
+        extraction_rules.update(rules)
+        field_scanner = FieldScanner(extraction_rules)
+        
+        self.config["extraction_rules"] = extraction_rules
+        self.field_scanner = field_scanner
+        
+        config_path = "config/api_config.json"
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(self.config, f, indent=2, ensure_ascii=False)
+        
+        print("字段抽取规则已更新")
+        return True
+        
+    except Exception as e:
+        print(f"更新抽取规则失败: {e}")
+        return False
+
 def get_api_status(self) -> Dict:
     """获取API状态"""
     status = {}
@@ -245,41 +748,65 @@ def get_api_status(self) -> Dict:
         }
     return status
 
-def export_to_excel(self, output_path: str = None) -> str:
-    """导出结果到Excel文件"""
-    if not self.results:
+def export_to_excel(self, output_path: str = None, results: List[Dict] = None) -> str:
+    """导出结果到Excel文件（未传入 results 时导出 self.results）"""
+    if results is None:
+        results = self.results
+    if not results:
         raise ValueError("没有可导出的结果")
     
     if output_path is None:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         output_path = f"银行截图识别结果_轻量版_{timestamp}.xlsx"
     
-    data = []
-    for result in self.results:
-        data.append({
-            '图像文件': os.path.basename(result.get('image_path', '')),
-            '银行名称': result.get('bank_name', ''),
-            '公司名称': result.get('company_name', ''),
-            '银行账号': result.get('account_number', ''),
-            '账户余额': result.get('balance', ''),
-            '数据库银行名称': result.get('bank_name_db', ''),
-            '数据库公司名称': result.get('company_name_db', ''),
-            '数据库账号': result.get('account_number_db', ''),
-            '验证状态': result.get('validation_status', ''),
-            '处理时间': result.get('extraction_time', ''),
-            '状态': result.get('status', ''),
-            '置信度': result.get('extraction_confidence', '')
-        })
-    
-    df = pd.DataFrame(data)
-    df.to_excel(output_path, index=False)
+    if isinstance(results, ResultStore):
+        # 落盘结果逐行写入，避免一次性构建整张表
+        _write_excel_streaming(output_path, (_excel_row(result) for result in results))
+    else:
+        data = [_excel_row(result) for result in results]
+        df = pd.DataFrame(data)
+        df.to_excel(output_path, index=False)
     
     print(f"Excel文件已保存: {output_path}")
     return output_path
 
-def export_to_html(self, output_path: str = None) -> str:
-    """导出结果到HTML文件"""
-    if not self.results:
+def _excel_row(result: Dict) -> Dict:
+    """单条结果对应的Excel行"""
+    return {
+        '图像文件': os.path.basename(result.get('image_path', '')),
+        '银行名称': result.get('bank_name', ''),
+        '公司名称': result.get('company_name', ''),
+        '银行账号': result.get('account_number', ''),
+        '账户余额': result.get('balance', ''),
+        '数据库银行名称': result.get('bank_name_db', ''),
+        '数据库公司名称': result.get('company_name_db', ''),
+        '数据库账号': result.get('account_number_db', ''),
+        '验证状态': result.get('validation_status', ''),
+        '公司名称匹配度': result.get('company_match_score', ''),
+        '处理时间': result.get('extraction_time', ''),
+        '状态': result.get('status', ''),
+        '置信度': result.get('extraction_confidence', '')
+    }
+
+def _write_excel_streaming(output_path: str, rows: Iterator[Dict]):
+    """使用openpyxl只写模式逐行写出Excel"""
+    from openpyxl import Workbook
+    
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    header = None
+    for row in rows:
+        if header is None:
+            header = list(row.keys())
+            sheet.append(header)
+        sheet.append(['' if row[column] is None else row[column] for column in header])
+    workbook.save(output_path)
+
+def export_to_html(self, output_path: str = None, results: List[Dict] = None) -> str:
+    """导出结果到HTML文件（未传入 results 时导出 self.results）"""
+    if results is None:
+        results = self.results
+    if not results:
         raise ValueError("没有可导出的结果")
     
     if output_path is None:
@@ -306,7 +833,7 @@ def export_to_html(self, output_path: str = None) -> str:
     <div class="container">
         <h1>银行截图识别结果报告 - 轻量版</h1>
         <p><strong>处理时间:</strong> {datetime.now().strftime('%Y年%m月%d日 %H:%M:%S')}</p>
-        <p><strong>总处理文件数:</strong> {len(self.results)}</p>
+        <p><strong>总处理文件数:</strong> {len(results)}</p>
         <table>
             <thead>
                 <tr>
@@ -321,8 +848,11 @@ def export_to_html(self, output_path: str = None) -> str:
             <tbody>
     """
     
-    for result in self.results:
-        html_content += f"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+        # 逐行写出，落盘结果无需整体载入内存
+        for result in results:
+            f.write(f"""
                 <tr>
                     <td>{os.path.basename(result.get('image_path', ''))}</td>
                     <td>{result.get('bank_name', '') or result.get('bank_name_db', '')}</td>
@@ -331,18 +861,15 @@ def export_to_html(self, output_path: str = None) -> str:
                     <td>{result.get('balance', '') if result.get('balance') is not None else ''}</td>
                     <td>{result.get('validation_status', '')}</td>
                 </tr>
-        """
-    
-    html_content += """
+        """)
+        
+        f.write("""
             </tbody>
         </table>
     </div>
 </body>
 </html>
-    """
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    """)
     
     print(f"HTML文件已保存: {output_path}")
     return output_path
\ No newline at end of file
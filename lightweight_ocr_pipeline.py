@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的批量流水线
+预处理（CPU密集，进程池）→ 服务商请求（IO密集，线程）→ 字段抽取与数据库比对，
+各阶段之间用有界队列衔接，上游过快时自动阻塞，避免解码后的图像堆积占满内存
+"""
+
+import os
+import math
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from lightweight_image_utils import ImagePayload, ImagePreprocessor
+
+# 队列结束标记
+_DONE = object()
+
+# 未配置 preprocess_workers 时自动选择的进程数上限（每个进程都要解码整张大图）
+MAX_AUTO_PREPROCESS_WORKERS = 4
+
+
+def available_cpus() -> int:
+    """当前进程实际可用的CPU数（考虑CPU亲和性与容器的cgroup配额）"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "max 100000" 或 "200000 100000"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            limit, period = f.read().split()[:2]
+        if limit != 'max':
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                limit = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+            if limit > 0 and period > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota:
+        cpus = min(cpus, max(math.ceil(quota), 1))
+    return max(cpus, 1)
+
+
+def _preprocess_in_worker(preprocessor: ImagePreprocessor, image_path: str) -> Optional[ImagePayload]:
+    """在预处理子进程中执行（模块级函数以便序列化）"""
+    return preprocessor.preprocess(image_path)
+
+
+class BatchPipeline:
+    """三阶段批量处理流水线"""
+
+    def __init__(self, processor, pipeline_config: Dict = None):
+        """
+        初始化流水线
+
+        Args:
+            processor: LightweightOCRProcessor 实例，提供缓存、服务商调用与字段抽取
+            pipeline_config: 流水线配置（对应配置文件中的 pipeline 节点）
+        """
+        self.processor = processor
+        self.pipeline_config = pipeline_config or {}
+        self._process_pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_process_pool(self) -> Optional[ProcessPoolExecutor]:
+        """
+        懒加载预处理进程池（跨批次复用，避免反复启动子进程）
+
+        spawn/forkserver 子进程会以 __mp_main__ 身份重新导入主模块，
+        入口模块不应在导入时创建处理器（见 enterprise_app.get_ocr_processor）
+        """
+        workers = self.pipeline_config.get("preprocess_workers", 0) \
+            or min(available_cpus(), MAX_AUTO_PREPROCESS_WORKERS)
+        if workers <= 1:
+            return None
+        with self._pool_lock:
+            if self._process_pool is None:
+                try:
+                    context = multiprocessing.get_context(self.pipeline_config.get("start_method", "spawn"))
+                    self._process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+                except (OSError, ValueError) as e:
+                    print(f"创建预处理进程池失败，改为在线程中预处理: {e}")
+                    return None
+            return self._process_pool
+
+    def _reset_process_pool(self):
+        """进程池损坏（如子进程被杀）时丢弃，下一批次重新创建"""
+        with self._pool_lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False, cancel_futures=True)
+                self._process_pool = None
+
+    def close(self):
+        """关闭预处理进程池"""
+        with self._pool_lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=True, cancel_futures=True)
+                self._process_pool = None
+
+    def run(self, image_paths: List[str], cancel_event: threading.Event = None,
+            bank_data=None, validate: bool = True) -> Iterator[Tuple[int, Dict]]:
+        """
+        按完成顺序逐个产出 (输入序号, 结果)
+
+        Args:
+            image_paths: 图像路径列表
+            cancel_event: 可选，置位后停止投递新图像并尽快结束（已在途的请求不再产出）
+            bank_data: 可选，整批共用的银行库快照
+            validate: False 时只抽取字段，留待整批比对
+
+        Yields:
+            (index, result)：index 为该图像在 image_paths 中的位置
+        """
+        if not image_paths:
+            return
+
+        queue_size = max(int(self.pipeline_config.get("queue_size", 32)), 1)
+        io_workers = max(int(self.pipeline_config.get("io_workers", 16)), 1)
+        io_workers = min(io_workers, len(image_paths))
+
+        io_queue = queue.Queue(maxsize=queue_size)
+        finish_queue = queue.Queue(maxsize=queue_size)
+        stop_event = threading.Event()
+        process_pool = self._get_process_pool()
+
+        def stopped() -> bool:
+            return stop_event.is_set() or (cancel_event is not None and cancel_event.is_set())
+
+        def put(target: queue.Queue, item) -> bool:
+            # 下游阻塞时定期检查停止标记，避免消费方提前退出后线程永远挂起
+            while not stopped():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def feed():
+            try:
+                for index, image_path in enumerate(image_paths):
+                    if stopped():
+                        return
+                    start_time = datetime.now()
+                    print(f"开始处理图像: {image_path}")
+                    # 单张图像出错只影响该图像，与逐张处理时一致
+                    try:
+                        cache_key = self.processor._ocr_cache_key(image_path)
+                        cached_text_data = self.processor._lookup_cached_text(image_path, cache_key)
+                    except Exception as e:
+                        error = f"图像处理失败: {str(e)}"
+                        if not put(finish_queue, (index, image_path, start_time, [], error)):
+                            return
+                        continue
+                    if cached_text_data is not None:
+                        if not put(finish_queue, (index, image_path, start_time, cached_text_data, None)):
+                            return
+                        continue
+
+                    future = None
+                    if process_pool is not None:
+                        try:
+                            future = process_pool.submit(
+                                _preprocess_in_worker, self.processor.image_preprocessor, image_path
+                            )
+                        except Exception as e:
+                            print(f"预处理进程池不可用，改为在线程中预处理: {e}")
+                    if not put(io_queue, (index, image_path, start_time, cache_key, future)):
+                        return
+            finally:
+                for _ in range(io_workers):
+                    if not put(io_queue, _DONE):
+                        break
+
+        def recognize():
+            while not stopped():
+                try:
+                    item = io_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    put(finish_queue, _DONE)
+                    return
+                index, image_path, start_time, cache_key, future = item
+                error = None
+                try:
+                    if future is not None:
+                        try:
+                            image_data = future.result()
+                        except Exception as e:
+                            print(f"子进程预处理失败，改为在线程中预处理: {e}")
+                            self._reset_process_pool()
+                            image_data = self.processor._preprocess_image(image_path)
+                    else:
+                        image_data = self.processor._preprocess_image(image_path)
+                    text_data = self.processor._recognize_payload(image_path, image_data, cache_key)
+                except Exception as e:
+                    text_data = []
+                    error = f"图像处理失败: {str(e)}"
+                if not put(finish_queue, (index, image_path, start_time, text_data, error)):
+                    return
+
+        threads = [threading.Thread(target=feed, name="ocr-pipeline-feed", daemon=True)]
+        threads += [
+            threading.Thread(target=recognize, name=f"ocr-pipeline-io-{i}", daemon=True)
+            for i in range(io_workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            remaining_workers = io_workers
+            while remaining_workers and not stopped():
+                try:
+                    item = finish_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    remaining_workers -= 1
+                    continue
+                index, image_path, start_time, text_data, error = item
+                if error:
+                    result = self.processor._failed_result(image_path, error, start_time)
+                else:
+                    result = self.processor._build_result(image_path, text_data, start_time, bank_data, validate)
+                yield index, result
+        finally:
+            stop_event.set()
+            # 取消尚未开始的子进程预处理任务
+            while True:
+                try:
+                    item = io_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _DONE and item[4] is not None:
+                    item[4].cancel()
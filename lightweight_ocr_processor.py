@@ -6,17 +6,25 @@
 """
 
 import os
-import re
 import json
-import base64
-import hashlib
-import sqlite3
-import requests
-from datetime import datetime
 from typing import Dict, List, Optional
 import pandas as pd
-from PIL import Image
-import io
+import time
+import weakref
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from lightweight_image_utils import ImagePayload, ImagePreprocessor
+from lightweight_ocr_http import ProviderSessionPool, BaiduTokenManager
+from lightweight_ocr_pipeline import BatchPipeline
+from lightweight_field_scanner import FieldScanner
+from lightweight_bank_matcher import BankNameMatcher, bank_names_from_dataframe
+from lightweight_bank_index import BankDatabaseIndex
+from lightweight_bank_cache import BankDatabaseCache
+from lightweight_bank_reload import BankDataGeneration, BankDatabaseWatcher, resolve_workbook_path, workbook_signature
+from lightweight_ocr_cache import (
+    OCRResultCache, MemoryCacheBackend, PerceptualHashIndex, create_cache_backend
+)
 
 class LightweightOCRProcessor:
     """轻量级OCR处理器 - 基于API调用"""
@@ -30,7 +38,73 @@ class LightweightOCRProcessor:
         """
         self.config = self._load_config(config_path)
         self.results = []
-        self.bank_database = self._load_bank_database()
+        
+        # 银行库、账号索引与银行名称匹配器（内置名单 + 银行库中的银行名称与别名）按"代"整体替换，
+        # 热加载时原子切换；优先从编译缓存加载
+        self.bank_data = BankDataGeneration.empty()
+        self._bank_reload_lock = threading.Lock()
+        self._bank_generations = weakref.WeakSet()
+        self._swap_bank_generation(self._build_bank_generation())
+        
+        # 按服务商复用的HTTP长连接池
+        pipeline_config = self.config.get("pipeline", {})
+        self.http_pool = ProviderSessionPool(
+            self.config.get("http_pool", {}),
+            concurrency=pipeline_config.get("io_workers", 16) if pipeline_config.get("enabled", True) else 1
+        )
+        
+        # 百度access_token缓存（跨图片、跨线程及跨进程共享）
+        self._baidu_token_manager = None
+        self._token_manager_lock = threading.Lock()
+        
+        # 多服务商并发调用线程池
+        self.dispatch_executor = ThreadPoolExecutor(
+            max_workers=self._dispatch_pool_size(),
+            thread_name_prefix="ocr-dispatch"
+        )
+        
+        # 缓存后端（memory / sqlite / redis），供OCR结果与百度token共用
+        cache_config = self.config.get("ocr_cache", {})
+        self.cache_backend = None
+        if cache_config.get("enabled", False) \
+                or self.config["ocr_apis"]["baidu"].get("token_store") == "cache_backend":
+            try:
+                self.cache_backend = create_cache_backend(cache_config)
+            except Exception as e:
+                print(f"缓存后端初始化失败，改用进程内存缓存: {e}")
+                self.cache_backend = MemoryCacheBackend(
+                    max_entries=cache_config.get("max_entries", 10000),
+                    max_bytes=cache_config.get("max_bytes", 268435456)
+                )
+        
+        # 按图像内容寻址的OCR结果缓存
+        self.ocr_cache = None
+        if cache_config.get("enabled", False):
+            self.ocr_cache = OCRResultCache(self.cache_backend, ttl=cache_config.get("ttl", 604800))
+        
+        # 感知哈希近重复索引（同一页面重复截图时复用OCR结果）
+        near_duplicate_config = self.config.get("near_duplicate", {})
+        self.near_duplicate_index = None
+        if near_duplicate_config.get("enabled", False):
+            hash_size = near_duplicate_config.get("hash_size", 32)
+            self.near_duplicate_index = PerceptualHashIndex(
+                hash_bits=hash_size * hash_size,
+                max_distance=near_duplicate_config.get("max_distance", 0),
+                capacity=near_duplicate_config.get("capacity", 2000),
+                ttl=near_duplicate_config.get("ttl", 86400),
+                ignore_top_ratio=near_duplicate_config.get("ignore_top_ratio", 0.05),
+                pixel_tolerance=near_duplicate_config.get("pixel_tolerance", 32)
+            )
+        
+        # 预编译的字段抽取规则（规则更新时重新编译）
+        self.field_scanner = FieldScanner(self.config["extraction_rules"])
+        
+        # 图像预处理器（仅依赖配置，可发送到预处理子进程）
+        self.image_preprocessor = ImagePreprocessor(self.config)
+        
+        # 批量处理流水线（首次批量处理时创建）
+        self._batch_pipeline = None
+        self._pipeline_lock = threading.Lock()
         
         # 支持的OCR API提供商
         self.api_providers = {
@@ -41,6 +115,13 @@ class LightweightOCRProcessor:
             'google': self._call_google_ocr
         }
         
+        # 银行库工作簿监控（新增或变化时后台重新加载）
+        self._bank_watcher = None
+        bank_db_config = self.config.get("bank_database", {})
+        if bank_db_config.get("watch", True):
+            self._bank_watcher = BankDatabaseWatcher(self, bank_db_config.get("watch_interval", 30))
+            self._bank_watcher.start()
+        
         print("轻量级OCR处理器初始化完成")
     
     def _load_config(self, config_path: str) -> Dict:
@@ -52,7 +133,10 @@ class LightweightOCRProcessor:
                     "api_key": "",
                     "secret_key": "",
                     "url": "https://aip.baidubce.com/rest/2.0/ocr/v1/general_basic",
-                    "confidence_threshold": 0.8
+                    "confidence_threshold": 0.8,
+                    "token_store": "file",
+                    "token_cache_path": "config/baidu_token.json",
+                    "token_refresh_margin": 86400
                 },
                 "tencent": {
                     "enabled": False,
@@ -83,7 +167,127 @@ class LightweightOCRProcessor:
             "image_preprocessing": {
                 "max_size": 4096,
                 "quality": 85,
-                "format": "JPEG"
+                "format": "JPEG",
+                "fast_downscale": True,
+                "reducing_gap": 2.0,
+                "passthrough": False,
+                "passthrough_formats": ["JPEG", "PNG"],
+                "passthrough_max_bytes": 3145728,
+                "provider_budgeting": False
+            },
+            "provider_payloads": {
+                "baidu": {
+                    "formats": ["PNG_GRAY", "JPEG_GRAY", "JPEG"],
+                    "target_bytes": 1048576,
+                    "max_bytes": 3000000,
+                    "max_side": 4096,
+                    "min_quality": 60
+                },
+                "azure": {
+                    "formats": ["PNG_GRAY", "JPEG_GRAY", "JPEG"],
+                    "target_bytes": 1048576,
+                    "max_bytes": 4000000,
+                    "max_side": 4200,
+                    "min_quality": 60
+                },
+                "google": {
+                    "formats": ["PNG_GRAY", "WEBP_GRAY", "JPEG"],
+                    "target_bytes": 1048576,
+                    "max_bytes": 7000000,
+                    "max_side": 4096,
+                    "min_quality": 60
+                }
+            },
+            "dispatch": {
+                "strategy": "sequential",
+                "image_deadline": 20,
+                "hedge_delay": 0.5,
+                "priority": ["baidu", "azure", "google", "tencent", "aliyun"],
+                "max_workers": 8
+            },
+            "ocr_cache": {
+                "enabled": True,
+                "backend": "sqlite",
+                "db_path": "cache/ocr_cache.db",
+                "redis_url": "redis://redis:6379/0",
+                "key_prefix": "bank-ocr:",
+                "max_entries": 10000,
+                "max_bytes": 268435456,
+                "ttl": 604800
+            },
+            "text_crop": {
+                "enabled": False,
+                "mode": "stitch",
+                "analysis_width": 360,
+                "edge_threshold": 40,
+                "min_density": 0.02,
+                "gap_ratio": 0.01,
+                "margin_ratio": 0.01,
+                "max_coverage": 0.85,
+                "separator": 8
+            },
+            "tiling": {
+                "enabled": False,
+                "min_aspect_ratio": 2.5,
+                "tile_height": 2400,
+                "overlap": 200,
+                "dedup_window": 30
+            },
+            "near_duplicate": {
+                "enabled": False,
+                "hash_size": 32,
+                "max_distance": 0,
+                "ignore_top_ratio": 0.05,
+                "tolerance": 4,
+                "verify_width": 270,
+                "pixel_tolerance": 32,
+                "capacity": 2000,
+                "ttl": 86400
+            },
+            "pipeline": {
+                "enabled": True,
+                "min_batch": 2,
+                "preprocess_workers": 0,
+                "start_method": "spawn",
+                "io_workers": 16,
+                "queue_size": 32
+            },
+            "bank_database": {
+                "path": "公司在用银行库*.xlsx",
+                "cache_enabled": True,
+                "cache_path": "cache/bank_database.pkl",
+                "watch": True,
+                "watch_interval": 30
+            },
+            "bank_matcher": {
+                "enabled": True,
+                "use_builtin": True
+            },
+            "batch_validation": {
+                "enabled": True,
+                "min_batch": 200,
+                "chunk_size": 5000
+            },
+            "company_match": {
+                "enabled": True,
+                "top_k": 5,
+                "min_score": 0.5,
+                "min_margin": 0.05
+            },
+            "result_spill": {
+                "enabled": True,
+                "min_batch": 1000,
+                "backend": "sqlite",
+                "directory": "results/spill",
+                "retention_hours": 24
+            },
+            "http_pool": {
+                "pool_connections": 10,
+                "pool_maxsize": 16,
+                "pool_block": False,
+                "keep_alive": True,
+                "max_retries": 0,
+                "providers": {}
             },
             "extraction_rules": {
                 "bank_name_patterns": [
@@ -94,7 +298,8 @@ class LightweightOCRProcessor:
                     r"\d{10,25}",
                     r"\d{4}[\s-]*\d{4}[\s-]*\d{4}[\s-]*\d{4,}",
                     r"账号[:：]?\s*(\d{10,25})",
-                    r"卡号[:：]?\s*(\d{10,25})"
+                    r"卡号[:：]?\s*(\d{10,25})",
+                    r"\d{4,6}[\s-]*(?:[*＊xX•●]+[\s-]*)+\d{3,4}"
                 ],
                 "balance_patterns": [
                     r"可用余额[:：]?\s*[¥￥]?([\d,]+\.?\d*)",
@@ -129,10 +334,88 @@ class LightweightOCRProcessor:
             print(f"配置文件加载失败，使用默认配置: {e}")
             return default_config
     
-    def _load_bank_database(self) -> pd.DataFrame:
+    def get_connection_stats(self) -> Dict:
+        """获取各OCR服务商的HTTP连接复用统计"""
+        return self.http_pool.get_stats()
+    
+    def get_cache_stats(self) -> Dict:
+        """获取OCR结果缓存统计"""
+        stats = self.ocr_cache.get_stats() if self.ocr_cache is not None else {}
+        stats['enabled'] = self.ocr_cache is not None
+        if self.near_duplicate_index is not None:
+            stats['near_duplicate'] = self.near_duplicate_index.get_stats()
+        return stats
+    
+    @property
+    def bank_database(self) -> pd.DataFrame:
+        """当前代的银行库数据"""
+        return self.bank_data.bank_database
+    
+    @property
+    def bank_index(self) -> BankDatabaseIndex:
+        """当前代的账号索引"""
+        return self.bank_data.bank_index
+    
+    @property
+    def bank_matcher(self) -> BankNameMatcher:
+        """当前代的银行名称匹配器"""
+        return self.bank_data.bank_matcher
+    
+    def _build_bank_generation(self) -> Optional[BankDataGeneration]:
+        """构建新一代银行库数据：工作簿未变化时直接读取编译缓存，否则解析工作簿并重建缓存"""
+        start = time.perf_counter()
+        db_config = self.config.get("bank_database", {})
+        database_path = resolve_workbook_path(db_config.get("path", "公司在用银行库*.xlsx"))
+        signature = workbook_signature(database_path)
+        cache = None
+        if db_config.get("cache_enabled", True):
+            cache = BankDatabaseCache(db_config.get("cache_path", "cache/bank_database.pkl"))
+        cache_tag = {"bank_matcher": self.config.get("bank_matcher", {})}
+        previous = self.bank_data
+        
+        payload = cache.load(database_path, cache_tag) if cache else None
+        if payload is not None:
+            bank_index = payload["bank_index"]
+            bank_matcher = payload["bank_matcher"]
+            source = "cache"
+            print(f"银行数据库从编译缓存加载，共 {len(bank_index.df)} 条记录")
+        else:
+            bank_database = self._load_bank_database(database_path)
+            if bank_database.empty and signature is not None and previous.generation:
+                # 工作簿存在但无法读取（如仍在写入），保留当前代
+                print(f"新银行库加载失败，继续使用第 {previous.generation} 代")
+                return None
+            # 账号 -> 行的哈希索引，比对时无需整表扫描
+            bank_index = BankDatabaseIndex(bank_database)
+            bank_matcher = self._build_bank_matcher(bank_database, previous.bank_matcher)
+            source = "workbook" if not bank_database.empty else "empty"
+            if cache and not bank_database.empty:
+                cache.save(database_path, cache_tag, {
+                    "bank_index": bank_index,
+                    "bank_matcher": bank_matcher
+                })
+        
+        return BankDataGeneration(
+            previous.generation + 1, bank_index, bank_matcher, database_path, signature, source,
+            (time.perf_counter() - start) * 1000
+        )
+    
+    def _swap_bank_generation(self, generation: BankDataGeneration):
+        """原子切换到新一代银行库（处理中的请求继续使用各自持有的旧代）"""
+        self.bank_data = generation
+        self._bank_generations.add(generation)
+        print(f"银行数据库已切换到第 {generation.generation} 代: {generation.get_status()}")
+    
+    def get_bank_database_status(self) -> Dict:
+        """获取当前银行库代信息"""
+        status = self.bank_data.get_status()
+        status['live_generations'] = sorted(generation.generation for generation in list(self._bank_generations))
+        status['watching'] = self._bank_watcher is not None
+        return status
+    
+    def _load_bank_database(self, database_path: str = "公司在用银行库20250412.xlsx") -> pd.DataFrame:
         """加载银行数据库"""
         try:
-            database_path = "公司在用银行库20250412.xlsx"
             if os.path.exists(database_path):
                 excel_file = pd.ExcelFile(database_path)
                 if 'bank' in excel_file.sheet_names:
@@ -148,66 +431,94 @@ class LightweightOCRProcessor:
             print(f"银行数据库加载失败: {e}")
             return pd.DataFrame()
     
-    def _preprocess_image(self, image_path: str) -> str:
-        """图像预处理并转换为base64"""
-        try:
-            with Image.open(image_path) as img:
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                max_size = self.config["image_preprocessing"]["max_size"]
-                if max(img.size) > max_size:
-                    ratio = max_size / max(img.size)
-                    new_size = tuple(int(dim * ratio) for dim in img.size)
-                    img = img.resize(new_size, Image.Resampling.LANCZOS)
-                
-                buffer = io.BytesIO()
-                img.save(buffer, 
-                        format=self.config["image_preprocessing"]["format"],
-                        quality=self.config["image_preprocessing"]["quality"])
-                
-                image_data = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                return image_data
-                
-        except Exception as e:
-            print(f"图像预处理失败: {e}")
-            return ""
+    def _build_bank_matcher(self, bank_database: pd.DataFrame, previous: BankNameMatcher) -> BankNameMatcher:
+        """根据银行库构建银行名称匹配器（基于上一代的副本，仅新增名称时增量更新）"""
+        matcher_config = self.config.get("bank_matcher", {})
+        if not matcher_config.get("enabled", True):
+            return BankNameMatcher()
+        names = bank_names_from_dataframe(bank_database, matcher_config.get("use_builtin", True))
+        matcher = previous.copy()
+        matcher.update(names)
+        print(f"银行名称匹配器已更新: {matcher.get_stats()}")
+        return matcher
+    
+    def _preprocess_image(self, image_path: str) -> Optional[ImagePayload]:
+        """图像预处理，返回编码后的原始字节（base64由需要的服务商惰性生成）"""
+        return self.image_preprocessor.preprocess(image_path)
+    
+    def _dispatch_pool_size(self) -> int:
+        """
+        服务商调用线程池大小
+
+        流水线的每个I/O线程都可能同时向所有服务商发请求，排队等待线程的时间同样计入单图截止时间，
+        因此至少为 I/O线程数 × 服务商数（按配置中的全部服务商计，运行时启用也不会不足；线程按需创建）
+        """
+        configured = self.config.get("dispatch", {}).get("max_workers", 8)
+        pipeline_config = self.config.get("pipeline", {})
+        io_workers = pipeline_config.get("io_workers", 16) if pipeline_config.get("enabled", True) else 1
+        return max(configured, max(int(io_workers), 1) * len(self.config["ocr_apis"]))
+    
+    def _get_batch_pipeline(self) -> BatchPipeline:
+        """获取批量处理流水线（懒加载，进程池跨批次复用）"""
+        with self._pipeline_lock:
+            if self._batch_pipeline is None:
+                self._batch_pipeline = BatchPipeline(self, self.config.get("pipeline", {}))
+            return self._batch_pipeline
     
-    def _call_baidu_ocr(self, image_data: str) -> List[Dict]:
+    def _get_baidu_token_manager(self) -> BaiduTokenManager:
+        """获取百度token管理器，凭据变更时重建"""
+        config = self.config["ocr_apis"]["baidu"]
+        with self._token_manager_lock:
+            manager = self._baidu_token_manager
+            if manager is None or manager.api_key != config["api_key"] \
+                    or manager.secret_key != config["secret_key"]:
+                manager = BaiduTokenManager(
+                    self.http_pool,
+                    config["api_key"],
+                    config["secret_key"],
+                    cache_path=config.get("token_cache_path", "config/baidu_token.json"),
+                    refresh_margin=config.get("token_refresh_margin", 86400),
+                    store=self.cache_backend if config.get("token_store") == "cache_backend" else None
+                )
+                self._baidu_token_manager = manager
+            return manager
+    
+    def _call_baidu_ocr(self, image_data: ImagePayload) -> List[Dict]:
         """调用百度OCR API"""
         try:
             config = self.config["ocr_apis"]["baidu"]
             if not config["enabled"] or not config["api_key"]:
                 return []
             
-            token_url = "https://aip.baidubce.com/oauth/2.0/token"
-            token_params = {
-                "grant_type": "client_credentials",
-                "client_id": config["api_key"],
-                "client_secret": config["secret_key"]
-            }
-            
-            token_response = requests.post(token_url, params=token_params, timeout=10)
-            if token_response.status_code != 200:
-                print("百度OCR获取token失败")
-                return []
-            
-            access_token = token_response.json().get("access_token")
+            token_manager = self._get_baidu_token_manager()
+            access_token = token_manager.get_token()
             if not access_token:
-                print("百度OCR token无效")
                 return []
             
-            ocr_url = f"{config['url']}?access_token={access_token}"
             ocr_data = {
-                "image": image_data,
+                "image": image_data.for_provider('baidu').base64,
                 "language_type": "CHN_ENG"
             }
             
-            response = requests.post(ocr_url, data=ocr_data, timeout=30)
+            response = self.http_pool.post('baidu', f"{config['url']}?access_token={access_token}",
+                                           data=ocr_data, timeout=30)
             if response.status_code != 200:
                 print(f"百度OCR调用失败: {response.status_code}")
                 return []
             
+            result = response.json()
+            if token_manager.is_auth_error(result):
+                # token被提前吊销或过期，刷新后重试一次
+                print("百度OCR token失效，刷新后重试")
+                access_token = token_manager.refresh_after_auth_error(access_token)
+                if not access_token:
+                    return []
+                response = self.http_pool.post('baidu', f"{config['url']}?access_token={access_token}",
+                                               data=ocr_data, timeout=30)
+                if response.status_code != 200:
+                    print(f"百度OCR调用失败: {response.status_code}")
+                    return []
+            
             result = response.json()
             if "words_result" not in result:
                 print("百度OCR返回格式错误")
@@ -229,7 +540,7 @@ class LightweightOCRProcessor:
             print(f"百度OCR调用失败: {e}")
             return []
     
-    def _call_tencent_ocr(self, image_data: str) -> List[Dict]:
+    def _call_tencent_ocr(self, image_data: ImagePayload) -> List[Dict]:
         """调用腾讯OCR API"""
         try:
             config = self.config["ocr_apis"]["tencent"]
@@ -241,7 +552,7 @@ class LightweightOCRProcessor:
             print(f"腾讯OCR调用失败: {e}")
             return []
     
-    def _call_aliyun_ocr(self, image_data: str) -> List[Dict]:
+    def _call_aliyun_ocr(self, image_data: ImagePayload) -> List[Dict]:
         """调用阿里云OCR API"""
         try:
             config = self.config["ocr_apis"]["aliyun"]
@@ -253,7 +564,7 @@ class LightweightOCRProcessor:
             print(f"阿里云OCR调用失败: {e}")
             return []
     
-    def _call_azure_ocr(self, image_data: str) -> List[Dict]:
+    def _call_azure_ocr(self, image_data: ImagePayload) -> List[Dict]:
         """调用Azure OCR API"""
         try:
             config = self.config["ocr_apis"]["azure"]
@@ -273,9 +584,9 @@ class LightweightOCRProcessor:
                 'detectOrientation': 'true'
             }
             
-            image_bytes = base64.b64decode(image_data)
-            response = requests.post(url, headers=headers, params=params, 
-                                   data=image_bytes, timeout=30)
+            # Azure直接接收原始字节，无需base64往返
+            response = self.http_pool.post('azure', url, headers=headers, params=params,
+                                           data=image_data.for_provider('azure').raw, timeout=30)
             
             if response.status_code != 200:
                 print(f"Azure OCR调用失败: {response.status_code}")
@@ -300,7 +611,7 @@ class LightweightOCRProcessor:
             print(f"Azure OCR调用失败: {e}")
             return []
     
-    def _call_google_ocr(self, image_data: str) -> List[Dict]:
+    def _call_google_ocr(self, image_data: ImagePayload) -> List[Dict]:
         """调用Google OCR API"""
         try:
             config = self.config["ocr_apis"]["google"]
@@ -311,12 +622,12 @@ class LightweightOCRProcessor:
             
             payload = {
                 "requests": [{
-                    "image": {"content": image_data},
+                    "image": {"content": image_data.for_provider('google').base64},
                     "features": [{"type": "TEXT_DETECTION", "maxResults": 50}]
                 }]
             }
             
-            response = requests.post(url, json=payload, timeout=30)
+            response = self.http_pool.post('google', url, json=payload, timeout=30)
             
             if response.status_code != 200:
                 print(f"Google OCR调用失败: {response.status_code}")
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级OCR处理器的落盘结果存储
+超大批量处理时每条结果处理完即追加写入磁盘，内存中只保留统计摘要，
+导出时再从磁盘逐条读回，峰值内存与批量大小无关；
+调用方用完后删除存储文件，遗留文件（如进程中途退出）超过保留期后清理
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator
+
+
+class ResultStore:
+    """落盘结果存储基类"""
+
+    name = "base"
+    suffix = ""
+
+    def __init__(self, path: str):
+        """
+        初始化结果存储
+
+        Args:
+            path: 存储文件路径
+        """
+        self.path = path
+        self.summary = {'total': 0, 'status': {}, 'validation_status': {}}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def append(self, index: int, result: Dict):
+        """追加一条结果（index 为该图像在输入列表中的位置）"""
+        data = json.dumps(result, ensure_ascii=False, default=str)
+        with self._lock:
+            self._write(index, data)
+            self._update_summary(result)
+
+    def _update_summary(self, result: Dict):
+        """更新内存中的统计摘要"""
+        self.summary['total'] += 1
+        for field in ('status', 'validation_status'):
+            value = result.get(field)
+            if value:
+                self.summary[field][value] = self.summary[field].get(value, 0) + 1
+
+    def _write(self, index: int, data: str):
+        raise NotImplementedError
+
+    def __iter__(self) -> Iterator[Dict]:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return self.summary['total']
+
+    def __bool__(self) -> bool:
+        return self.summary['total'] > 0
+
+    def close(self):
+        """关闭存储文件"""
+
+    def delete(self):
+        """关闭并删除存储文件（结果已导出或已返回给调用方后调用）"""
+        self.close()
+        for path in (self.path, self.path + '-journal', self.path + '-wal', self.path + '-shm'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"删除结果存储文件失败: {e}")
+
+
+class JSONLResultStore(ResultStore):
+    """
+    JSONL结果存储：按完成顺序追加，读回时按输入顺序排列
+
+    每行为 {"image_index": 序号, "result": 结果}；内存中只保留按序号排列的行偏移（每条8字节），
+    读回时按偏移定位，与SQLite后端一样返回输入顺序
+    """
+
+    name = "jsonl"
+    suffix = ".jsonl"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._file = open(path, 'ab')
+        self._offset = self._file.tell()
+        self._offsets = array('q')
+
+    def _write(self, index: int, data: str):
+        line = f'{{"image_index": {index}, "result": {data}}}\n'.encode('utf-8')
+        if index >= len(self._offsets):
+            self._offsets.extend([-1] * (index + 1 - len(self._offsets)))
+        self._offsets[index] = self._offset
+        self._file.write(line)
+        self._offset += len(line)
+
+    def __iter__(self) -> Iterator[Dict]:
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+            offsets = array('q', self._offsets)
+        with open(self.path, 'rb') as f:
+            for offset in offsets:
+                if offset < 0:
+                    continue
+                f.seek(offset)
+                yield json.loads(f.readline())['result']
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class SQLiteResultStore(ResultStore):
+    """SQLite结果存储：按完成顺序追加，读回时按输入顺序排列"""
+
+    name = "sqlite"
+    suffix = ".db"
+
+    # 每写入多少条提交一次事务
+    COMMIT_EVERY = 200
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                image_index INTEGER NOT NULL,
+                data TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_image_index ON results(image_index)")
+        self._conn.commit()
+        self._pending = 0
+        self._closed = False
+
+    def _write(self, index: int, data: str):
+        self._conn.execute("INSERT INTO results (image_index, data) VALUES (?, ?)", (index, data))
+        self._pending += 1
+        if self._pending >= self.COMMIT_EVERY:
+            self._conn.commit()
+            self._pending = 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        with self._lock:
+            if not self._closed:
+                self._conn.commit()
+                self._pending = 0
+        # 独立连接读取，游标逐行返回，不会一次性载入全部结果
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            for (data,) in conn.execute("SELECT data FROM results ORDER BY image_index"):
+                yield json.loads(data)
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            if not self._closed:
+                self._conn.commit()
+                self._conn.close()
+                self._closed = True
+
+
+def cleanup_expired_stores(directory: str, retention_seconds: float) -> int:
+    """删除结果目录中超过保留期的批次文件，返回删除的文件数"""
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    expires_before = time.time() - retention_seconds
+    for filename in os.listdir(directory):
+        if not filename.startswith('batch_'):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            if os.path.isfile(path) and os.path.getmtime(path) < expires_before:
+                os.remove(path)
+                removed += 1
+        except OSError as e:
+            print(f"清理过期结果文件失败: {e}")
+    return removed
+
+
+def create_result_store(spill_config: Dict) -> ResultStore:
+    """根据 result_spill 配置在结果目录下新建一个批次的结果存储（顺带清理过期的批次文件）"""
+    backend = spill_config.get("backend", "sqlite")
+    store_class = JSONLResultStore if backend == "jsonl" else SQLiteResultStore
+    directory = spill_config.get("directory", "results/spill")
+    removed = cleanup_expired_stores(directory, spill_config.get("retention_hours", 24) * 3600)
+    if removed:
+        print(f"已清理 {removed} 个过期的批量结果文件")
+    filename = f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}{store_class.suffix}"
+    return store_class(os.path.join(directory, filename))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""测试公共设置：让测试直接导入仓库根目录下的模块，并提供按需配置的处理器"""
+
+import os
+import sys
+import json
+import inspect
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _bind_processor_methods():
+    """lightweight_ocr_methods 中的处理器方法以模块级函数定义，测试时挂到处理器类上"""
+    import lightweight_ocr_methods
+    from lightweight_ocr_processor import LightweightOCRProcessor
+
+    for name, function in vars(lightweight_ocr_methods).items():
+        if inspect.isfunction(function) and function.__module__ == lightweight_ocr_methods.__name__ \
+                and not hasattr(LightweightOCRProcessor, name):
+            setattr(LightweightOCRProcessor, name, function)
+    return LightweightOCRProcessor
+
+
+@pytest.fixture
+def make_processor(tmp_path, monkeypatch):
+    """
+    在临时目录中按仓库配置创建处理器
+
+    用法: make_processor({'dispatch': {'strategy': 'parallel'}})，字典类型的节点按键合并；
+    默认关闭结果缓存与银行库监控，不启用任何服务商
+    """
+    processor_class = _bind_processor_methods()
+    created = []
+
+    def make(overrides=None):
+        with open(os.path.join(ROOT, "config", "api_config.json"), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        config["ocr_cache"]["enabled"] = False
+        config.setdefault("bank_database", {})["watch"] = False
+        for provider_config in config["ocr_apis"].values():
+            provider_config["enabled"] = False
+        for key, value in (overrides or {}).items():
+            if isinstance(value, dict) and isinstance(config.get(key), dict):
+                config[key].update(value)
+            else:
+                config[key] = value
+
+        monkeypatch.chdir(tmp_path)
+        os.makedirs("config", exist_ok=True)
+        with open("config/api_config.json", 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        processor = processor_class()
+        created.append(processor)
+        return processor
+
+    yield make
+    for processor in created:
+        if processor._batch_pipeline is not None:
+            processor._batch_pipeline.close()
+        processor.dispatch_executor.shutdown(wait=False, cancel_futures=True)
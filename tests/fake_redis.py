@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""进程内的 Redis 替身，只实现缓存后端用到的 redis-py 接口"""
+
+import time
+
+
+class FakeRedis:
+    """字典实现的 Redis 客户端替身，支持 ex 过期时间，值按 redis-py 习惯以 bytes 返回"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.closed = False
+
+    def get(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and time.time() >= expires_at:
+            self.delete(key)
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode('utf-8') if isinstance(value, str) else value
+        if ex is not None:
+            self.expires[key] = time.time() + ex
+        else:
+            self.expires.pop(key, None)
+        return True
+
+    def delete(self, key):
+        self.expires.pop(key, None)
+        return 1 if self.data.pop(key, None) is not None else 0
+
+    def info(self, section=None):
+        return {'used_memory': sum(len(value) for value in self.data.values())}
+
+    def close(self):
+        self.closed = True
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""字段抽取器测试：预编译规则的结果与逐条 re.findall 一致"""
+
+import re
+
+from lightweight_field_scanner import FieldScanner
+
+
+def scan(rules, text):
+    return FieldScanner(rules).scan(text)
+
+
+def test_required_literal_prefilter_skips_rules():
+    scanner = FieldScanner({'balance_patterns': [r"可用余额[:：]?\s*([\d,]+\.?\d*)"]})
+    assert scanner.rules['balance'][0].literal_groups == [['可用余额']]
+    assert scanner.scan("余额 100.00")['balance'] is None
+    assert scanner.scan("可用余额：1,234.50")['balance'] == 1234.5
+
+
+def test_scoped_ignorecase_group_is_not_prefiltered():
+    rules = {'bank_name_patterns': [r"(?i:bank of china)"]}
+    text = "BANK OF CHINA 账户"
+    assert re.findall(rules['bank_name_patterns'][0], text) == ["BANK OF CHINA"]
+    assert scan(rules, text)['bank_name'] == "BANK OF CHINA"
+
+
+def test_case_sensitive_literals_outside_scoped_group_still_prefilter():
+    rules = {'bank_name_patterns': [r"户名(?i:\s*bank)"]}
+    scanner = FieldScanner(rules)
+    assert scanner.rules['bank_name'][0].literal_groups == [['户名']]
+    assert scanner.scan("户名 BANK")['bank_name'] == "户名 BANK"
+
+
+def test_global_ignorecase_rule_matches():
+    assert scan({'bank_name_patterns': [r"(?i)bank of china"]}, "Bank Of China")['bank_name'] == "Bank Of China"
+
+
+def test_named_value_group_and_priority():
+    rules = {'account_patterns': [r"卡号[:：]?\s*(?P<value>\d{10,25})", r"\d{10,25}"]}
+    assert scan(rules, "账号 1111111111 卡号：6225880112345678")['account_number'] == "6225880112345678"
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""OCR结果缓存与 Redis 缓存后端测试（使用进程内 Redis 替身）"""
+
+import time
+
+from fake_redis import FakeRedis
+from lightweight_ocr_cache import OCRResultCache, RedisCacheBackend
+
+TEXT_DATA = [
+    {'text': '中国农业银行', 'confidence': 0.95},
+    {'text': '可用余额: 437.07', 'confidence': 0.90}
+]
+
+
+def make_backend(client=None):
+    return RedisCacheBackend(key_prefix="test:", client=client or FakeRedis())
+
+
+def test_redis_backend_round_trip_decodes_bytes():
+    client = FakeRedis()
+    backend = make_backend(client)
+    backend.set("k", "值", ttl=60)
+    assert client.data["test:k"] == "值".encode('utf-8')
+    assert backend.get("k") == "值"
+
+
+def test_redis_backend_missing_key_returns_none():
+    assert make_backend().get("missing") is None
+
+
+def test_redis_backend_ttl_expires_entry():
+    backend = make_backend()
+    backend.set("k", "v", ttl=1)
+    backend.client.expires["test:k"] = time.time() - 1
+    assert backend.get("k") is None
+
+
+def test_redis_backend_ttl_is_at_least_one_second():
+    backend = make_backend()
+    backend.set("k", "v", ttl=0.2)
+    assert backend.client.expires["test:k"] - time.time() > 0.5
+
+
+def test_redis_backend_delete_and_close():
+    backend = make_backend()
+    backend.set("k", "v", ttl=60)
+    backend.delete("k")
+    assert backend.get("k") is None
+    backend.close()
+    assert backend.client.closed
+
+
+def test_redis_backend_stats_report_memory():
+    backend = make_backend()
+    backend.set("k", "v", ttl=60)
+    stats = backend.get_stats()
+    assert stats['backend'] == "redis"
+    assert stats['used_memory'] == 1
+
+
+def test_result_cache_hit_and_miss_counts():
+    cache = OCRResultCache(make_backend(), ttl=60)
+    key = OCRResultCache.make_key(b"image", {'quality': 85})
+    assert cache.get(key) is None
+    cache.set(key, TEXT_DATA)
+    assert cache.get(key) == TEXT_DATA
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_result_cache_shared_between_instances():
+    # 多个应用容器共用同一个 Redis，一个写入另一个直接命中
+    client = FakeRedis()
+    key = OCRResultCache.make_key(b"image", {})
+    OCRResultCache(make_backend(client)).set(key, TEXT_DATA)
+    assert OCRResultCache(make_backend(client)).get(key) == TEXT_DATA
+
+
+def test_result_cache_key_depends_on_settings():
+    key = OCRResultCache.make_key(b"image", {'tiling': {'enabled': False}})
+    assert key == OCRResultCache.make_key(b"image", {'tiling': {'enabled': False}})
+    assert key != OCRResultCache.make_key(b"image", {'tiling': {'enabled': True}})
+    assert key != OCRResultCache.make_key(b"other", {'tiling': {'enabled': False}})
+
+
+def test_result_cache_tolerates_backend_errors():
+    class BrokenRedis(FakeRedis):
+        def get(self, key):
+            raise ConnectionError("redis down")
+
+        def set(self, key, value, ex=None):
+            raise ConnectionError("redis down")
+
+    cache = OCRResultCache(make_backend(BrokenRedis()))
+    cache.set("k", TEXT_DATA)
+    assert cache.get("k") is None
+    assert cache.misses == 1
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""HTTP连接池与百度 token 管理器测试（token 通过共享缓存后端在多个副本间复用）"""
+
+import json
+import time
+
+from fake_redis import FakeRedis
+from lightweight_ocr_cache import RedisCacheBackend
+from lightweight_ocr_http import BaiduTokenManager, ProviderSessionPool
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+
+class FakeHttpPool:
+    """记录请求次数的连接池替身，每次返回新的 token"""
+
+    def __init__(self, status_code=200):
+        self.calls = 0
+        self.status_code = status_code
+
+    def post(self, provider, url, **kwargs):
+        self.calls += 1
+        return FakeResponse({'access_token': f"token-{self.calls}", 'expires_in': 2592000},
+                            self.status_code)
+
+
+def make_manager(pool, store, api_key="key"):
+    return BaiduTokenManager(pool, api_key, "secret", cache_path=None, store=store)
+
+
+def test_token_written_to_store_and_reused_by_other_replica():
+    store = RedisCacheBackend(key_prefix="test:", client=FakeRedis())
+    pool = FakeHttpPool()
+    assert make_manager(pool, store).get_token() == "token-1"
+    assert make_manager(pool, store).get_token() == "token-1"
+    assert pool.calls == 1
+
+
+def test_store_entry_expires_with_token():
+    client = FakeRedis()
+    manager = make_manager(FakeHttpPool(), RedisCacheBackend(key_prefix="test:", client=client))
+    manager.get_token()
+    key = f"test:baidu_token:{manager.cache_key}"
+    entry = json.loads(client.get(key))
+    assert entry['access_token'] == "token-1"
+    assert abs(client.expires[key] - entry['expires_at']) < 5
+
+
+def test_auth_error_refresh_replaces_stale_token():
+    store = RedisCacheBackend(key_prefix="test:", client=FakeRedis())
+    pool = FakeHttpPool()
+    manager = make_manager(pool, store)
+    stale = manager.get_token()
+    assert manager.refresh_after_auth_error(stale) == "token-2"
+    # 其他副本从共享缓存读到的是新 token
+    assert make_manager(pool, store).get_token() == "token-2"
+    assert pool.calls == 2
+
+
+def test_credentials_do_not_share_tokens():
+    store = RedisCacheBackend(key_prefix="test:", client=FakeRedis())
+    pool = FakeHttpPool()
+    make_manager(pool, store, api_key="a").get_token()
+    assert make_manager(pool, store, api_key="b").get_token() == "token-2"
+
+
+def test_failed_token_request_returns_none():
+    store = RedisCacheBackend(key_prefix="test:", client=FakeRedis())
+    manager = make_manager(FakeHttpPool(status_code=500), store)
+    assert manager.get_token() is None
+    assert manager._expires_at < time.time()
+
+
+def test_pool_maxsize_covers_pipeline_concurrency():
+    pool = ProviderSessionPool({'pool_maxsize': 10, 'providers': {'azure': {'pool_maxsize': 4}}}, concurrency=16)
+    assert pool._provider_config('baidu')['pool_maxsize'] == 16
+    assert pool._provider_config('azure')['pool_maxsize'] == 16
+    adapter = pool.get_session('baidu').get_adapter('https://aip.baidubce.com')
+    assert adapter._pool_maxsize == 16
+
+
+def test_pool_maxsize_keeps_larger_configured_value():
+    pool = ProviderSessionPool({'pool_maxsize': 32}, concurrency=16)
+    assert pool._provider_config('baidu')['pool_maxsize'] == 32
+    assert ProviderSessionPool()._provider_config('baidu')['pool_maxsize'] == 16
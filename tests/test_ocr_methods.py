@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""服务商调度与识别结果处理测试"""
+
+from datetime import datetime
+
+import pytest
+from PIL import Image
+
+from lightweight_image_utils import ImagePayload
+
+
+def make_image(directory, name="statement.png"):
+    path = directory / name
+    Image.new('RGB', (120, 240), 'white').save(path)
+    return str(path)
+
+
+def test_no_enabled_provider_uses_simulated_text(make_processor, tmp_path):
+    processor = make_processor()
+    text_data = processor._extract_text_from_image(make_image(tmp_path, "abc.png"))
+    assert text_data and all(item['engine'] == 'simulated' for item in text_data)
+
+
+def test_all_providers_failing_fails_the_image(make_processor, tmp_path):
+    processor = make_processor({'dispatch': {'strategy': 'parallel', 'image_deadline': 1}})
+    for provider in ('baidu', 'tencent'):
+        processor.config['ocr_apis'][provider]['enabled'] = True
+        processor.api_providers[provider] = lambda image_data: []
+    image_path = make_image(tmp_path, "abc.png")
+
+    assert processor._extract_text_from_image(image_path) == []
+    result = processor._build_result(image_path, [], datetime.now())
+    assert result['status'] == 'FAILED'
+
+
+def tile_payload(raws, overlap=None):
+    return ImagePayload.from_tiles([ImagePayload(raw) for raw in raws], (1080, 4000), overlap)
+
+
+def test_text_crop_band_without_text_is_skipped(make_processor):
+    processor = make_processor()
+    processor.config['ocr_apis']['baidu']['enabled'] = True
+    # 第二个裁剪分块是图标行，服务商不返回文字
+    texts = {b'name': ['户名 深圳某某贸易有限公司'], b'icons': [], b'balance': ['余额 88,000.50']}
+    processor.api_providers['baidu'] = lambda tile: [{'text': text, 'confidence': 0.9} for text in texts[tile.raw]]
+
+    text_data, complete = processor._dispatch_tiles(tile_payload([b'name', b'icons', b'balance']), {})
+    assert [item['text'] for item in text_data] == ['户名 深圳某某贸易有限公司', '余额 88,000.50']
+    assert complete
+
+
+def test_overlapping_tile_without_text_fails_the_image(make_processor):
+    processor = make_processor()
+    processor.config['ocr_apis']['baidu']['enabled'] = True
+    texts = {b'top': ['转账 -100.00'], b'bottom': []}
+    processor.api_providers['baidu'] = lambda tile: [{'text': text, 'confidence': 0.9} for text in texts[tile.raw]]
+
+    with pytest.raises(RuntimeError):
+        processor._dispatch_tiles(tile_payload([b'top', b'bottom'], [0.0, 0.1]), {})
+
+
+def test_cache_key_tracks_output_affecting_settings(make_processor, tmp_path):
+    processor = make_processor({'ocr_cache': {'enabled': True, 'backend': 'memory'},
+                                'dispatch': {'strategy': 'cascade'}})
+    processor.config['ocr_apis']['baidu']['enabled'] = True
+    image_path = make_image(tmp_path)
+    key = processor._ocr_cache_key(image_path)
+
+    processor.config['dispatch']['priority'] = list(reversed(processor.config['dispatch']['priority']))
+    priority_key = processor._ocr_cache_key(image_path)
+    assert priority_key != key
+
+    processor.config['ocr_apis']['baidu']['url'] = "https://aip.baidubce.com/rest/2.0/ocr/v1/accurate_basic"
+    url_key = processor._ocr_cache_key(image_path)
+    assert url_key != priority_key
+
+    # 凭据与截止时间不影响识别结果
+    processor.config['ocr_apis']['baidu']['api_key'] = "rotated"
+    processor.config['dispatch']['image_deadline'] = 5
+    assert processor._ocr_cache_key(image_path) == url_key
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""批量流水线测试"""
+
+import time
+
+from PIL import Image
+
+PROVIDERS = ('baidu', 'tencent', 'aliyun')
+
+
+def make_images(directory, count):
+    paths = []
+    for index in range(count):
+        path = directory / f"statement_{index}.png"
+        Image.new('RGB', (120, 240), (255, index * 10 % 256, 255)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def slow_provider(name, delay):
+    def call(image_data):
+        time.sleep(delay)
+        return [{'text': f"{name} 可用余额: 437.07", 'confidence': 0.95}]
+    return call
+
+
+def test_parallel_dispatch_keeps_deadline_with_more_images_than_dispatch_workers(make_processor, tmp_path):
+    # 配置的 max_workers 远小于 I/O线程数 × 服务商数，排队时间不能挤占单图截止时间
+    processor = make_processor({
+        'dispatch': {'strategy': 'parallel', 'image_deadline': 1.5, 'max_workers': 2},
+        'pipeline': {'enabled': True, 'min_batch': 2, 'preprocess_workers': 1, 'io_workers': 8},
+    })
+    for provider in PROVIDERS:
+        processor.config['ocr_apis'][provider]['enabled'] = True
+        processor.api_providers[provider] = slow_provider(provider, 0.3)
+
+    image_paths = make_images(tmp_path, 16)
+    results = dict(processor._get_batch_pipeline().run(image_paths, validate=False))
+
+    assert sorted(results) == list(range(len(image_paths)))
+    for result in results.values():
+        assert result['status'] == 'SUCCESS'
+        engines = sorted(item['text'].split()[0] for item in result['text_data'])
+        assert engines == sorted(PROVIDERS)
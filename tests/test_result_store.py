@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""落盘结果存储测试：两种后端都按输入顺序读回"""
+
+import json
+import os
+
+import pytest
+
+from lightweight_result_store import JSONLResultStore, SQLiteResultStore, cleanup_expired_stores
+
+# 流水线按完成顺序写入
+COMPLETION_ORDER = [3, 0, 5, 1, 4, 2]
+
+
+@pytest.mark.parametrize("store_class", [JSONLResultStore, SQLiteResultStore])
+def test_results_read_back_in_input_order(tmp_path, store_class):
+    store = store_class(str(tmp_path / f"batch_test{store_class.suffix}"))
+    for index in COMPLETION_ORDER:
+        store.append(index, {'image_path': f"x_{index}.png", 'status': 'SUCCESS', '备注': '中文'})
+
+    expected = [f"x_{index}.png" for index in sorted(COMPLETION_ORDER)]
+    assert [result['image_path'] for result in store] == expected
+    assert len(store) == len(COMPLETION_ORDER)
+    assert store.summary['status'] == {'SUCCESS': len(COMPLETION_ORDER)}
+
+    # 关闭后仍可读回
+    store.close()
+    assert [result['image_path'] for result in store] == expected
+    store.delete()
+    assert not os.path.exists(store.path)
+
+
+def test_jsonl_rows_record_image_index(tmp_path):
+    store = JSONLResultStore(str(tmp_path / "batch_test.jsonl"))
+    store.append(2, {'status': 'FAILED'})
+    store.append(0, {'status': 'SUCCESS'})
+    store.close()
+    with open(store.path, 'r', encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+    assert [row['image_index'] for row in rows] == [2, 0]
+    assert [result['status'] for result in store] == ['SUCCESS', 'FAILED']
+
+
+def test_cleanup_expired_stores_only_removes_old_batches(tmp_path):
+    old = tmp_path / "batch_old.db"
+    new = tmp_path / "batch_new.db"
+    other = tmp_path / "keep.txt"
+    for path in (old, new, other):
+        path.write_text("x")
+    os.utime(old, (0, 0))
+    os.utime(other, (0, 0))
+    assert cleanup_expired_stores(str(tmp_path), 3600) == 1
+    assert not old.exists() and new.exists() and other.exists()